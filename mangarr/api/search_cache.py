@@ -1,31 +1,37 @@
-import threading
+"""
+Results of background searches, stored in the shared cache so any web worker can answer the status request.
+Entries expire on their own, while Redis is unavailable the cache backend keeps them locally (see core.cache).
+"""
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+import json
 import time
 
-_search_results = {}
-_lock = threading.Lock()
+KEY_PREFIX = "search:"
+RESULT_TIMEOUT = 60
+# Search which didn't finish by then (e.g. its worker died) is forgotten
+PROCESSING_TIMEOUT = 600
+
+def _store(task_id, entry:dict, timeout:int) -> None:
+    # Stored as JSON so the status response is the same as the one built from the search result
+    cache.set(f"{KEY_PREFIX}{task_id}", json.dumps(entry, cls=DjangoJSONEncoder), timeout)
 
 def mark_processing(task_id):
-    with _lock:
-        _search_results[str(task_id)] = {
-            "status": "processing",
-            "timestamp": time.time(),
-        }
+    _store(task_id, {
+        "status": "processing",
+        "timestamp": time.time(),
+    }, PROCESSING_TIMEOUT)
 
 def store_result(task_id, data):
-    with _lock:
-        _search_results[str(task_id)] = {
-            "status": "done",
-            "data": data,
-            "timestamp": time.time(),
-        }
-    # Schedule cleanup after 60 seconds
-    timer = threading.Timer(60, lambda: remove_result(task_id))
-    timer.start()
+    _store(task_id, {
+        "status": "done",
+        "data": data,
+        "timestamp": time.time(),
+    }, RESULT_TIMEOUT)
 
 def remove_result(task_id):
-    with _lock:
-        _search_results.pop(str(task_id), None)
+    cache.delete(f"{KEY_PREFIX}{task_id}")
 
 def get_result(task_id):
-    with _lock:
-        return _search_results.get(str(task_id))
+    value = cache.get(f"{KEY_PREFIX}{task_id}")
+    return json.loads(value) if value is not None else None
@@ -1,3 +1,52 @@
 from django.test import TestCase
+from django.contrib.auth.models import User
+from django.urls import reverse
+from database.manga.models import Library, Manga, Volume, Chapter
+from database.manga import search_index
+import json
 
 # Create your tests here.
+class StatsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("stats", password="password")
+        self.library = Library.objects.create(name="Stats")
+        manga = Manga.objects.create(library=self.library, url="https://example.com/manga", plugin="example")
+        volume = Volume.objects.create(manga=manga)
+        Chapter.objects.create(volume=volume, url="https://example.com/chapter/1", downloaded=True, file_size=1000)
+        Chapter.objects.create(volume=volume, url="https://example.com/chapter/2", downloaded=True, file_size=500)
+        # Reset for redownload, its old file size must not be counted
+        Chapter.objects.create(volume=volume, url="https://example.com/chapter/3", downloaded=False, file_size=700)
+
+    def test_stats_counts_downloaded_chapters_and_bytes(self):
+        response = self.client.get(reverse("api_stats"), HTTP_AUTHORIZATION=f"Bearer {self.user.profile.token}")
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["chapters"], 3)
+        self.assertEqual(data["downloaded"], 2)
+        self.assertEqual(data["bytes"], 1500)
+        library = next(library for library in data["libraries"] if library["name"] == "Stats")
+        self.assertEqual((library["mangas"], library["chapters"], library["downloaded"], library["bytes"]), (1, 3, 2, 1500))
+
+    def test_stats_requires_token(self):
+        response = self.client.get(reverse("api_stats"))
+
+        self.assertNotEqual(response.status_code, 200)
+
+class MassEditTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser("admin", password="password")
+        self.manga = Manga.objects.create(library=Library.objects.create(name="Mass edit"), url="https://example.com/manga", plugin="example")
+        volume = Volume.objects.create(manga=self.manga)
+        self.chapter = Chapter.objects.create(volume=volume, url="https://example.com/chapter/1")
+
+    def test_renamed_chapters_are_reindexed(self):
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse("api_mass_edit_manga", args=[self.manga.id]),
+            json.dumps({"field": "name", "value": "Renamed"}),
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(search_index.search("Renamed", search_index.CHAPTER), [str(self.chapter.id)])
@@ -33,6 +33,8 @@ urlpatterns = [
     path("manga/request/approve", views.approve_manga_request, name="approve_manga_request"),
     path("manga/request/deny", views.deny_manga_request, name="deny_manga_request"),
     path("manga/monitor", views.monitor_manga, name="api_monitor_manga"),
+    path("jobs", views.jobs, name="api_jobs"),
+    path("jobs/<str:job_type>/<int:job_id>/retry", views.retry_job, name="api_retry_job"),
     path("manga/edit/<uuid:manga_id>", views.edit_manga, name="api_edit_manga"),
     path("manga/edit/<uuid:manga_id>/request", views.request_edit_manga, name="api_request_edit_manga"),
     path("manga/delete/<uuid:manga_id>", views.delete_manga, name="api_delete_manga"),
@@ -44,4 +46,5 @@ urlpatterns = [
     path("chapter/edit/<uuid:chapter_id>/request", views.request_edit_chapter, name="api_request_edit_chapter"),
     path("chapter/redownload/<uuid:chapter_id>/request", views.request_redownload_chapter, name="api_request_redownload_chapter"),
     path("chapter/transfer/<uuid:chapter_id>/<uuid:manga_id>", views.transfer_chapter, name="api_transfer_chapter"),
+    path("chapter/transfer/targets/<uuid:manga_id>", views.transfer_targets, name="api_transfer_targets"),
 ]
\ No newline at end of file
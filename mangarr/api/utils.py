@@ -1,6 +1,7 @@
 from database.manga.models import MangaRequest, Manga
 from processes.models import MonitorManga
-from database.users.models import UserProfile
+from database.users.utils import get_request_token, get_user_id_by_token
+from django.utils.cache import patch_vary_headers
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from uuid import uuid4
@@ -25,13 +26,16 @@ def manga_is_requested(manga:dict) -> bool:
 
 def validate_token(func):
     def wrapper(request):
-        token = request.GET.get("token") or request.POST.get("token")
+        token = get_request_token(request)
         if token is None:
             return JsonResponse({"error": "Token is not defined"}, status=401)
-        if not UserProfile.objects.filter(token=token).exists():
+        if get_user_id_by_token(token) is None:
             return JsonResponse({"error": "Token is invalid"}, status=401)
         
-        return func(request)
+        response = func(request)
+        # Token in header instead of URL, proxies must not share the response between users
+        patch_vary_headers(response, ("Authorization",))
+        return response
     
     return wrapper
 
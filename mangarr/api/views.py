@@ -5,64 +5,113 @@ from django.urls import reverse
 from core.utils import superuser_or_staff_required, superuser_required
 from core.settings import FILE_PATH_ROOT
 from database.users.models import UserProfile, RegisterToken
-from database.manga.models import Manga, Volume, Chapter, Library
+from database.users.utils import get_request_token
+from database.manga.models import Manga, Volume, Chapter, Library, index_chapters
+from database.manga import search_index
+from database.manga.lockable_fields import with_shadow_fields
 from django.contrib.contenttypes.models import ContentType
 from connectors.models import ConnectorBase
 from django.utils.translation import gettext_lazy as _, pgettext
 from django.contrib.auth.decorators import permission_required
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST, require_GET
-import json, os
+import json, os, uuid
 from .utils import manga_is_monitored, manga_is_requested, validate_token, require_DELETE, require_GET_PATCH, start_background_search
-from processes.models import MonitorManga, MonitorChapter, EditChapter
+from processes.models import MonitorManga, MonitorChapter, EditChapter, JobState, PRIORITY_USER, queue_broadcaster
 from django.db import IntegrityError
+from django.db.models import Count, Q, Sum
+from django.core.exceptions import ObjectDoesNotExist
 from processes.tasks import trigger_monitor
+from plugins.cache import get_stats as get_plugin_cache_stats
 from django.utils.translation import override
 from core.settings import LANGUAGE_CODE
 import logging
 logger = logging.getLogger(__name__)
 
 
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+
 # Create your views here.
 @validate_token
 def search(request):
-    query:str = request.GET.get("query")
+    query:str = request.GET.get("query", "")
+    try:
+        page = max(1, int(request.GET.get("page", 1)))
+        limit = min(max(1, int(request.GET.get("limit", SEARCH_PAGE_SIZE))), SEARCH_MAX_PAGE_SIZE)
+    except ValueError:
+        return JsonResponse({"error": "Page and limit need to be numbers"}, status=400)
+    offset = (page - 1) * limit
 
-    mangas = []
-    volumes = []
-    chapters = []
+    def find(kind:str, queryset) -> list[dict]:
+        ids = search_index.search(query, kind, limit, offset)
+        objects = queryset.in_bulk(ids)
+        return [objects[pk].json_serialized() for pk in map(uuid.UUID, ids) if pk in objects]
 
-    for manga in Manga.objects.all():
-        if query.lower() in manga.name.value.lower():
-            mangas.append(manga.json_serialized())
+    return JsonResponse({
+        "mangas": find(search_index.MANGA, Manga.objects.select_related("library")),
+        "volumes": find(search_index.VOLUME, Volume.objects.select_related("manga__library")),
+        "chapters": find(search_index.CHAPTER, Chapter.objects.select_related("volume__manga__library", "chapter_edit")),
+        "page": page,
+    })
 
-    for volume in Volume.objects.all():
-        if query.lower() in volume.name.value.lower():
-            volumes.append(volume.json_serialized())
+@validate_token
+def stats(request):
+    manga_counts = Manga.objects.values("library").annotate(
+        mangas=Count("id"),
+        completed=Count("id", filter=Q(complete_value=True)),
+    )
+    chapter_counts = Chapter.objects.values("volume__manga__library").annotate(
+        chapters=Count("id"),
+        # Named differently from the model field, Q(downloaded=True) would resolve to the annotation otherwise
+        downloaded_chapters=Count("id", filter=Q(downloaded=True)),
+        bytes=Sum("file_size", filter=Q(downloaded=True)),
+    )
+    mangas_by_library = {row["library"]: row for row in manga_counts}
+    chapters_by_library = {row["volume__manga__library"]: row for row in chapter_counts}
+
+    libraries = []
+    for library_id, name in Library.objects.values_list("id", "name"):
+        mangas = mangas_by_library.get(library_id, {})
+        chapters = chapters_by_library.get(library_id, {})
+        libraries.append({
+            "id": library_id,
+            "name": name,
+            "mangas": mangas.get("mangas", 0),
+            "completed": mangas.get("completed", 0),
+            "chapters": chapters.get("chapters", 0),
+            "downloaded": chapters.get("downloaded_chapters", 0),
+            "bytes": chapters.get("bytes") or 0,
+        })
 
-    for chapter in Chapter.objects.all():
-        if query.lower() in chapter.name.value.lower():
-            chapters.append(chapter.json_serialized())
+    queue = {}
+    for job_type, get_queryset in JOB_QUERYSETS.items():
+        queue[job_type] = {state: 0 for state in JobState.values}
+        for row in get_queryset().order_by().values("state").annotate(count=Count("id")):
+            queue[job_type][row["state"]] = row["count"]
 
-    return JsonResponse({"mangas": mangas, "volumes": volumes, "chapters": chapters})
+    def total(key:str) -> int:
+        return sum(library[key] for library in libraries)
 
-@validate_token
-def stats(request):
-    mangas = [m.complete == True for m in Manga.objects.all()]
     return JsonResponse(
         {
-            "monitored": mangas.count(False),
-            "completed": mangas.count(True),
+            "monitored": total("mangas") - total("completed"),
+            "completed": total("completed"),
             "requested": MangaRequest.objects.count(),
-            "mangas": len(mangas),
-            "chapters": Chapter.objects.count(),
+            "mangas": total("mangas"),
+            "chapters": total("chapters"),
+            "downloaded": total("downloaded"),
+            "bytes": total("bytes"),
+            "libraries": libraries,
+            "queue": queue,
+            "plugin_cache": get_plugin_cache_stats(),
         })
 
 @csrf_exempt
 @require_POST
 @validate_token
 def regenerate_token_view(request):
-    token = UserProfile.objects.get(token=request.GET.get("token")).regenerate_token()
+    token = UserProfile.objects.get(token=get_request_token(request)).regenerate_token()
     return JsonResponse(data={"success": True, "token": token})
 
 
@@ -572,7 +621,7 @@ def monitor_manga(request):
         url = data.get("manga", {}).get("url")
         if url is not None:
             MangaRequest.delete_if_exist(url)
-        manga = MonitorManga(library=library.first(), plugin=plugin_key, url=url, arguments=data.get("manga"))
+        manga = MonitorManga(library=library.first(), plugin=plugin_key, url=url, arguments=data.get("manga"), priority=PRIORITY_USER)
 
         manga.save()
         trigger_monitor()
@@ -580,6 +629,47 @@ def monitor_manga(request):
     except Exception as e:
         return JsonResponse({"error": f"Error - {e}"}, status=500)
     
+JOB_QUERYSETS = {
+    "manga": lambda: MonitorManga.objects.all(),
+    "chapter": lambda: MonitorChapter.objects.all(),
+    "edit": lambda: EditChapter.objects.select_related("chapter__volume__manga"),
+}
+
+@permission_required("database_users.can_manage_monitors")
+@require_GET
+def jobs(request):
+    state = request.GET.get("state")
+    if state is not None and state not in JobState.values:
+        return JsonResponse({"error": f"State needs to be one of {', '.join(JobState.values)}"}, status=400)
+    try:
+        limit = int(request.GET.get("limit", 100))
+    except ValueError:
+        return JsonResponse({"error": "Limit needs to be a number"}, status=400)
+
+    output = {}
+    for job_type, get_queryset in JOB_QUERYSETS.items():
+        queryset = get_queryset()
+        if state is not None:
+            queryset = queryset.filter(state=state)
+        output[job_type] = [job.json_serialized() for job in queryset.order_by("-priority", "not_before")[:limit]]
+    return JsonResponse({"jobs": output})
+
+@permission_required("database_users.can_manage_monitors")
+@require_POST
+def retry_job(request, job_type, job_id):
+    if job_type not in JOB_QUERYSETS:
+        return JsonResponse({"error": f"Job type needs to be one of {', '.join(JOB_QUERYSETS.keys())}"}, status=400)
+    try:
+        job = JOB_QUERYSETS[job_type]().get(id=job_id)
+    except ObjectDoesNotExist:
+        return JsonResponse({"error": "Job not found"}, status=404)
+    if job.state == JobState.RUNNING:
+        return JsonResponse({"error": "Job is running"}, status=409)
+
+    job.retry()
+    trigger_monitor()
+    return JsonResponse({"success": True, "job": job.json_serialized()}, status=200)
+
 @permission_required("database_users.can_manage_metadata")
 @require_GET_PATCH
 def edit_manga(request, manga_id):
@@ -626,6 +716,7 @@ def request_edit_manga(request, manga_id):
                     new_edit_request = EditChapter(chapter=chapter)
                     new_edit_requests.append(new_edit_request)
         EditChapter.objects.bulk_create(new_edit_requests, batch_size=100)
+        queue_broadcaster.mark_dirty()
 
         trigger_monitor()
     except Exception as e:
@@ -679,6 +770,7 @@ def request_edit_volume(request, volume_id):
                 new_edit_request = EditChapter(chapter=chapter)
                 new_edit_requests.append(new_edit_request)
         EditChapter.objects.bulk_create(new_edit_requests, batch_size=100)
+        queue_broadcaster.mark_dirty()
         trigger_monitor()
     except Exception as e:
         logger.error(f"Error - {e}")
@@ -750,7 +842,8 @@ def request_redownload_chapter(request, chapter_id):
             url=chapter.url,
             manga=manga,
             plugin=manga.plugin,
-            arguments=chapter.arguments
+            arguments=chapter.arguments,
+            priority=PRIORITY_USER
             )
         chapter.downloaded = False
         chapter.save()
@@ -775,18 +868,14 @@ def transfer_chapter(request, chapter_id, manga_id):
         return JsonResponse({'error': "Manga not found"}, status=404)
     
     try:
-        volumes = Volume.objects.filter(manga=manga)
-        volume = None
-        for v in volumes:
-            if v.volume == chapter.volume.volume:
-                volume = v
-                break
-        
+        volume = Volume.objects.filter(manga=manga, number_value=chapter.volume.number.value).first()
         if volume is None:
             ch_volume = chapter.volume
             volume = Volume.objects.create(number=ch_volume.volume, manga=manga)
+        original_manga_id = chapter.volume.manga_id
         chapter.volume = volume
         chapter.save()
+        Manga.refresh_nsfw(Manga.objects.filter(id=original_manga_id))
         EditChapter.objects.create(chapter=chapter)
         trigger_monitor()
         return JsonResponse({'success': True}, status=200)
@@ -795,6 +884,29 @@ def transfer_chapter(request, chapter_id, manga_id):
 
         
     
+TRANSFER_TARGETS_PAGE_SIZE = 20
+
+@permission_required("database_users.can_manage_monitors")
+@require_GET
+def transfer_targets(request, manga_id):
+    query = request.GET.get("query", "").strip()
+    try:
+        page = max(1, int(request.GET.get("page", 1)))
+    except ValueError:
+        return JsonResponse({"error": "Page needs to be a number"}, status=400)
+
+    mangas = Manga.objects.exclude(id=manga_id).order_by("name_value")
+    if len(query) > 0:
+        mangas = mangas.filter(name_value__icontains=query)
+
+    start = (page - 1) * TRANSFER_TARGETS_PAGE_SIZE
+    results = list(mangas.only("id", "name")[start:start + TRANSFER_TARGETS_PAGE_SIZE + 1])
+    return JsonResponse({
+        "results": [{"id": str(m.id), "name": str(m)} for m in results[:TRANSFER_TARGETS_PAGE_SIZE]],
+        "page": page,
+        "has_more": len(results) > TRANSFER_TARGETS_PAGE_SIZE,
+    })
+
 @permission_required("database_users.can_manage_metadata")
 @require_DELETE
 def delete_manga(request, manga_id):
@@ -851,7 +963,12 @@ def mass_edit_manga(request, manga_id):
             except Exception as e:
                 logger.error(f"Error - {e}")
 
-    Chapter.objects.bulk_update(chapter_to_update, [field])
+    Chapter.objects.bulk_update(chapter_to_update, with_shadow_fields(Chapter, [field]))
+    # bulk_update doesn't send post_save
+    if field == "age_rating":
+        Manga.refresh_nsfw(Manga.objects.filter(id=manga.id))
+    elif field == "name":
+        index_chapters(chapter_to_update)
     
     return JsonResponse({
         "success": True
@@ -882,7 +999,7 @@ def approve_manga_request(request):
         if not library.exists():
             return JsonResponse({"error": "Library does not exist"}, status=400)
         
-        MonitorManga(library=library.first(), plugin=plugin, url=url, arguments=manga_request.variables).save()
+        MonitorManga(library=library.first(), plugin=plugin, url=url, arguments=manga_request.variables, priority=PRIORITY_USER).save()
 
         manga_request.delete()
         trigger_monitor()
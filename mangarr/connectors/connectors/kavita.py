@@ -1,5 +1,5 @@
 from .base import BaseConnector, skip_if_errored, connectors
-import requests
+from core.http_sessions import get_host_session
 import logging
 logger = logging.getLogger(__name__)
 
@@ -15,8 +15,9 @@ class KavitaConnector(BaseConnector):
         ip = self.ip
         if ip is None:
             raise Exception("IP was None")
+        session = get_host_session(ip)
         logger.debug(f"Authentificating Kavita on: {ip}")
-        res_login = requests.post(f"{ip}/api/Account/login",
+        res_login = session.post(f"{ip}/api/Account/login",
                     json={
                         "username": self.username,
                         "password": self.password,
@@ -30,7 +31,7 @@ class KavitaConnector(BaseConnector):
         jwt_token = data.get("token")
         if jwt_token is not None:
             logger.debug(f"Notifying library {library} on address: {ip}")
-            res_scan = requests.post(f"{ip}/api/Library/scan",
+            res_scan = session.post(f"{ip}/api/Library/scan",
                     params={
                         "libraryId": library,
                         "force": False
@@ -1,5 +1,7 @@
 from plugins.tasks import load_downloaded_plugins, background_update
 from processes.tasks import monitoring
+from processes.models import queue_broadcaster
+from processes.broadcast import download_progress
 from core.thread_manager import register_thread
 import threading
 
@@ -19,4 +21,17 @@ def start_background_tasks():
     # Downloader
     processes_thread = threading.Thread(target=_run_processes, daemon=True)
     register_thread(processes_thread)
-    processes_thread.start()
\ No newline at end of file
+    processes_thread.start()
+
+    # Websocket queue state
+    # Shared state in Redis is left over from the previous run, both parts are published again on start
+    queue_broadcaster.mark_dirty()
+    download_progress.broadcaster.mark_dirty()
+    broadcast_thread = threading.Thread(target=queue_broadcaster.run, daemon=True)
+    register_thread(broadcast_thread)
+    broadcast_thread.start()
+
+    # Websocket download progress
+    progress_thread = threading.Thread(target=download_progress.broadcaster.run, daemon=True)
+    register_thread(progress_thread)
+    progress_thread.start()
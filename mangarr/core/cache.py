@@ -0,0 +1,147 @@
+"""
+Cache backend and helpers shared by all the Django caches.
+
+Caches live in Redis, so every web worker sees the same entries and they survive restarts.
+When Redis can't be reached, the backend keeps working with a local in-memory cache and tries Redis again later.
+"""
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+import redis
+import threading
+import time
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Seconds Redis is not tried again after it failed
+RETRY_INTERVAL = 30
+
+class RedisCacheWithFallback(RedisCache):
+    """
+    Redis cache which falls back to a local LocMemCache while Redis is unavailable.
+
+    Besides the RedisCache settings it accepts MAX_ENTRIES and CULL_FREQUENCY (as top-level settings of the cache,
+    OPTIONS are passed to Redis). They bound the local cache and, when MAX_ENTRIES is set, the entries in Redis too:
+    keys are then tracked in a sorted set by last use and least recently used ones are deleted when the cache is full.
+    Entries written during the outage stay local and are not copied to Redis afterwards.
+    """
+
+    def __init__(self, server, params):
+        super().__init__(server, params)
+        self._max_entries = params.get("MAX_ENTRIES")
+        self._cull_frequency = params.get("CULL_FREQUENCY", 3)
+        self._index_key = f"{self.key_prefix}:entries"
+        fallback_options = {"CULL_FREQUENCY": self._cull_frequency}
+        if self._max_entries is not None:
+            fallback_options["MAX_ENTRIES"] = self._max_entries
+        self._fallback = LocMemCache(f"fallback:{self.key_prefix}", {**params, "OPTIONS": fallback_options})
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+
+    def _call(self, name:str, *args, written=(), read=(), removed=()):
+        """
+        Runs the method on Redis or on the local cache while Redis is unavailable.
+        written/read/removed are keys (already made) of the Redis entries the call wrote, read or deleted.
+        """
+        if time.monotonic() >= self._retry_at:
+            try:
+                result = getattr(super(), name)(*args)
+                if self._max_entries is not None and len(written) + len(read) + len(removed) > 0:
+                    self._update_index(written, read, removed)
+            except redis.RedisError as e:
+                with self._lock:
+                    if self._retry_at == 0.0:
+                        logger.warning(f"Redis cache is unavailable, using local cache - {e}")
+                    self._retry_at = time.monotonic() + RETRY_INTERVAL
+            else:
+                if self._retry_at != 0.0:
+                    with self._lock:
+                        self._retry_at = 0.0
+                    logger.info("Redis cache is available again")
+                return result
+        return getattr(self._fallback, name)(*args)
+
+    def _update_index(self, written, read, removed) -> None:
+        client = self._cache.get_client(write=True)
+        pipeline = client.pipeline(transaction=False)
+        now = time.time()
+        if len(written) > 0:
+            pipeline.zadd(self._index_key, {key: now for key in written})
+        if len(read) > 0:
+            # Hit moves the entry to the end of the eviction order, misses are not added
+            pipeline.zadd(self._index_key, {key: now for key in read}, xx=True)
+        if len(removed) > 0:
+            pipeline.zrem(self._index_key, *removed)
+        pipeline.zcard(self._index_key)
+        count = pipeline.execute()[-1]
+        if count > self._max_entries:
+            # Same as LocMemCache, 1/CULL_FREQUENCY of the entries is removed when the cache is full
+            culled = client.zpopmin(self._index_key, count - self._max_entries + self._max_entries // self._cull_frequency)
+            if len(culled) > 0:
+                client.delete(*[key for key, _ in culled])
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._call("add", key, value, timeout, version, written=[self.make_key(key, version=version)])
+
+    def get(self, key, default=None, version=None):
+        return self._call("get", key, default, version, read=[self.make_key(key, version=version)])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._call("set", key, value, timeout, version, written=[self.make_key(key, version=version)])
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._call("touch", key, timeout, version)
+
+    def delete(self, key, version=None):
+        return self._call("delete", key, version, removed=[self.make_key(key, version=version)])
+
+    def get_many(self, keys, version=None):
+        return self._call("get_many", keys, version)
+
+    def has_key(self, key, version=None):
+        return self._call("has_key", key, version)
+
+    def incr(self, key, delta=1, version=None):
+        return self._call("incr", key, delta, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._call("set_many", data, timeout, version, written=[self.make_key(key, version=version) for key in data])
+
+    def delete_many(self, keys, version=None):
+        return self._call("delete_many", keys, version, removed=[self.make_key(key, version=version) for key in keys])
+
+    def clear(self):
+        self._fallback.clear()
+        return self._call("clear")
+
+def _version_key(namespace:str) -> str:
+    return f"version:{namespace}"
+
+def get_version(namespace:str) -> int:
+    """
+    Returns current version of the namespace, keys made by versioned_key change with it.
+    """
+    return cache.get_or_set(_version_key(namespace), 1, None)
+
+def bump_version(namespace:str) -> int:
+    """
+    Invalidates all the keys of the namespace at once (old entries are left to expire).
+    """
+    try:
+        return cache.incr(_version_key(namespace))
+    except ValueError:
+        # Version expired or was never read, any new value invalidates the old keys
+        version = time.time_ns()
+        cache.set(_version_key(namespace), version, None)
+        return version
+
+def versioned_key(namespace:str, *parts) -> str:
+    """
+    Makes cache key valid until the namespace is bumped.
+
+    Example:
+        versioned_key("library", library.id, "page", 2) -> "library:v3:5:page:2"
+    """
+    return ":".join([namespace, f"v{get_version(namespace)}", *map(str, parts)])
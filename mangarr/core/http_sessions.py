@@ -0,0 +1,49 @@
+"""
+Shared HTTP sessions with connection pooling.
+
+Every session keeps connections alive, so consecutive requests to the same host skip
+TCP and TLS handshakes. Sessions are shared by all threads (urllib3 connection pool is thread-safe),
+pages of one plugin are downloaded through the plugin's session, other requests use session of their host.
+
+Sessions don't retry on their own, callers retry (see MangaPluginBase.download_page_to), so one failing
+request never multiplies into retries of retries. Host sessions are shared by unrelated callers, so they
+don't keep cookies, cookies passed to a request are still sent with it.
+"""
+from requests.adapters import HTTPAdapter
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlparse
+from core.settingz.downloads import HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE
+import requests
+import threading
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def create_session(persist_cookies:bool = True) -> requests.Session:
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if not persist_cookies:
+        # Set-Cookie of responses is ignored
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    return session
+
+def get_session(key:str, persist_cookies:bool = True) -> requests.Session:
+    """
+    Returns session shared under the key, it is created on first use.
+    """
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = _sessions[key] = create_session(persist_cookies)
+        return session
+
+def get_host_session(url:str) -> requests.Session:
+    return get_session(f"host:{urlparse(url).netloc}", persist_cookies=False)
+
+def close_sessions() -> None:
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
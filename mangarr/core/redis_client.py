@@ -0,0 +1,16 @@
+from core.settingz.redis import REDIS_URL
+import redis
+import threading
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_redis() -> redis.Redis:
+    """
+    Returns Redis client shared by the process (it has its own thread-safe connection pool).
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = redis.Redis.from_url(REDIS_URL, socket_timeout=2, socket_connect_timeout=2, health_check_interval=30)
+        return _client
@@ -16,6 +16,18 @@ LOGOUT_REDIRECT_URL = LOGIN_URL
 # Configs
 from .settingz.config import *
 
+# Downloads
+from .settingz.downloads import *
+
+# Monitoring
+from .settingz.monitoring import *
+
+# Browser
+from .settingz.browser import *
+
+# Caches
+from .settingz.caches import *
+
 # Cookies
 from .settingz.cookies import *
 
@@ -40,14 +52,8 @@ from .settingz.localization import *
 
 ASGI_APPLICATION = "core.asgi.application"
 
-CHANNEL_LAYERS = {
-    "default": {
-        "BACKEND": "channels_redis.core.RedisChannelLayer",
-        "CONFIG": {
-            "hosts": [("127.0.0.1", 6379)]
-        }
-    }
-}
+# Redis (channel layer)
+from .settingz.redis import *
 
 
 # Static files (CSS, JavaScript, Images)
@@ -0,0 +1,7 @@
+from .config import CONFIG
+
+DRIVER_POOL_SIZE = CONFIG.getint('Browser', 'driver_pool_size', 2, description='Maximum number of headless browsers running at once (each takes ~200 MB of memory)')
+
+DRIVER_CHECKOUT_TIMEOUT = CONFIG.getint('Browser', 'driver_checkout_timeout', 300, description='Seconds to wait for a free browser before the plugin call fails')
+
+DRIVER_IDLE_TIMEOUT = CONFIG.getint('Browser', 'driver_idle_timeout', 300, description='Seconds after which unused browser is shut down')
@@ -0,0 +1,39 @@
+from .config import CONFIG
+from .redis import REDIS_URL, REDIS_CACHE_DB
+
+PLUGIN_CACHE_ALIAS = "plugins"
+
+PLUGIN_CACHE_MAX_ENTRIES = CONFIG.getint('Cache', 'plugin_cache_max_entries', 1000, description='Maximum number of cached plugin responses, least recently used are evicted first')
+
+PLUGIN_CACHE_TIMEOUTS = {
+    "search_manga": CONFIG.getint('Cache', 'plugin_search_timeout', 300, description='Seconds search results of a plugin are cached (0 disables caching)'),
+    "get_manga": CONFIG.getint('Cache', 'plugin_manga_timeout', 900, description='Seconds manga metadata returned by a plugin is cached (0 disables caching)'),
+    "get_chapters": CONFIG.getint('Cache', 'plugin_chapters_timeout', 300, description='Seconds chapter lists returned by a plugin are cached (0 disables caching)'),
+}
+
+# Seconds the web request waits for Redis before the cache falls back to local memory
+CACHE_SOCKET_TIMEOUT = CONFIG.getfloat('Cache', 'redis_socket_timeout', 1.0, description='Seconds to wait for Redis before local cache is used instead')
+
+_REDIS_OPTIONS = {
+    "socket_connect_timeout": CACHE_SOCKET_TIMEOUT,
+    "socket_timeout": CACHE_SOCKET_TIMEOUT,
+}
+
+# Shared by all the workers through Redis, local memory is used only while Redis is unavailable (see core.cache)
+CACHES = {
+    "default": {
+        "BACKEND": "core.cache.RedisCacheWithFallback",
+        "LOCATION": f"{REDIS_URL}/{REDIS_CACHE_DB}",
+        "KEY_PREFIX": "mangarr",
+        "OPTIONS": _REDIS_OPTIONS,
+    },
+    PLUGIN_CACHE_ALIAS: {
+        # Least recently used entries are evicted when the cache is full, both in Redis and in the local fallback
+        "BACKEND": "core.cache.RedisCacheWithFallback",
+        "LOCATION": f"{REDIS_URL}/{REDIS_CACHE_DB}",
+        "KEY_PREFIX": "mangarr:plugins",
+        "OPTIONS": _REDIS_OPTIONS,
+        "MAX_ENTRIES": PLUGIN_CACHE_MAX_ENTRIES,
+        "CULL_FREQUENCY": 10,
+    },
+}
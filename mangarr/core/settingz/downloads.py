@@ -0,0 +1,25 @@
+from .config import CONFIG
+
+PAGE_WORKERS = CONFIG.getint('Downloads', 'page_workers', 4, description='Maximum number of pages downloaded at once per plugin (plugins can set lower limit)')
+
+HOST_REQUEST_INTERVAL = CONFIG.getfloat('Downloads', 'host_request_interval', 0.25, description='Minimum delay in seconds between two page requests to the same host')
+
+CHAPTER_WORKERS = CONFIG.getint('Downloads', 'chapter_workers', 2, description='Number of chapters downloaded at once')
+
+SOURCE_CHAPTER_WORKERS = CONFIG.getint('Downloads', 'source_chapter_workers', 1, description='Maximum number of chapters downloaded at once from one plugin/source')
+
+MAX_ATTEMPTS = CONFIG.getint('Downloads', 'max_attempts', 8, description='How many times is failed download/scan tried before it is marked as dead')
+
+RETRY_BASE_DELAY = CONFIG.getint('Downloads', 'retry_base_delay', 300, description='Delay in seconds before first retry of failed download/scan (doubles with every attempt)')
+
+RETRY_MAX_DELAY = CONFIG.getint('Downloads', 'retry_max_delay', 86400, description='Maximum delay in seconds between retries of failed download/scan')
+
+JOB_LEASE = CONFIG.getint('Downloads', 'job_lease', 300, description='Seconds a running download/scan stays reserved without renewal, job of a crashed worker is picked again after that')
+
+HTTP_POOL_CONNECTIONS = CONFIG.getint('Downloads', 'http_pool_connections', 10, description='Number of hosts whose connections are kept alive per HTTP session')
+
+HTTP_POOL_MAXSIZE = CONFIG.getint('Downloads', 'http_pool_maxsize', 8, description='Maximum number of kept alive connections per host (should be at least page_workers)')
+
+HTTP_RETRY_BACKOFF = CONFIG.getfloat('Downloads', 'http_retry_backoff', 0.5, description='Backoff factor in seconds between retries of page download (doubles with every retry)')
+
+HTTP_RETRY_AFTER_MAX = CONFIG.getint('Downloads', 'http_retry_after_max', 60, description='Maximum seconds waited before retrying page download when the server sends Retry-After')
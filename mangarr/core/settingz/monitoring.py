@@ -0,0 +1,11 @@
+from .config import CONFIG
+
+REFRESH_DEFAULT_INTERVAL = CONFIG.getint('Monitoring', 'refresh_default_interval', 24, description='Hours between refreshes of manga without known release cadence')
+
+REFRESH_MIN_INTERVAL = CONFIG.getint('Monitoring', 'refresh_min_interval', 3, description='Minimum hours between two refreshes of the same manga')
+
+REFRESH_HIATUS_INTERVAL = CONFIG.getint('Monitoring', 'refresh_hiatus_interval', 168, description='Hours between refreshes of manga on hiatus (no release for much longer than their usual cadence)')
+
+REFRESH_COMPLETE_INTERVAL = CONFIG.getint('Monitoring', 'refresh_complete_interval', 720, description='Hours between refreshes of completed manga')
+
+REFRESH_HIATUS_FACTOR = CONFIG.getfloat('Monitoring', 'refresh_hiatus_factor', 3.0, description='Manga is considered on hiatus when its last release is older than this many release intervals')
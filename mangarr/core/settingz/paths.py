@@ -41,4 +41,8 @@ FILE_PATH_ROOT = Path(os.path.join(MANGA_ROOT, 'media'))
 FILE_PATH_ROOT.mkdir(exist_ok=True)
 
 CACHE_FILE_PATH_ROOT = Path(os.path.join(MANGA_ROOT, 'cache'))
-CACHE_FILE_PATH_ROOT.mkdir(exist_ok=True)
\ No newline at end of file
+CACHE_FILE_PATH_ROOT.mkdir(exist_ok=True)
+
+# Pages of unfinished chapter downloads, kept between attempts (not cleared with the cache)
+STAGING_FILE_PATH_ROOT = Path(os.path.join(CACHE_FILE_PATH_ROOT, 'staging'))
+STAGING_FILE_PATH_ROOT.mkdir(exist_ok=True)
\ No newline at end of file
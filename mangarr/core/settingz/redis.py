@@ -0,0 +1,18 @@
+from .config import CONFIG
+
+REDIS_HOST = CONFIG.get('Redis', 'host', '127.0.0.1', description='Host of the Redis server (channel layer, caches, search results)')
+
+REDIS_PORT = CONFIG.getint('Redis', 'port', 6379, description='Port of the Redis server')
+
+REDIS_URL = f"redis://{REDIS_HOST}:{REDIS_PORT}"
+
+REDIS_CACHE_DB = CONFIG.getint('Redis', 'cache_db', 1, description='Number of the Redis database used by the Django caches (clearing the caches flushes the whole database)')
+
+CHANNEL_LAYERS = {
+    "default": {
+        "BACKEND": "channels_redis.core.RedisChannelLayer",
+        "CONFIG": {
+            "hosts": [(REDIS_HOST, REDIS_PORT)]
+        }
+    }
+}
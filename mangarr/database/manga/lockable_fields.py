@@ -4,15 +4,50 @@ from django.core.exceptions import ValidationError
 import logging
 logger = logging.getLogger(__name__)
 
+SHADOW_CHAR_MAX_LENGTH = 255
+
 class LockableFieldBase(models.JSONField):
     """
     Base class for lockable fields. Stores data in JSON format with 'value' and 'locked' keys.
+
+    With indexed=True the value is also kept in a typed, indexed '<name>_value' column,
+    so querysets can filter and order on it (e.g. Chapter.objects.order_by("number_value")).
     """
+    # Shadow column is a separate field, toggling indexed doesn't change this column
+    non_db_attrs = models.JSONField.non_db_attrs + ("indexed",)
     
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, indexed=False, **kwargs):
+        self.indexed = indexed
+        self.shadow_attname = None
         # Set default value structure
         kwargs.setdefault('default', self.get_default_structure)
         super().__init__(*args, **kwargs)
+
+    def get_shadow_field(self) -> models.Field:
+        """Override this method in subclasses which support indexed mode."""
+        raise TypeError(f"{type(self).__name__} does not support indexed=True")
+
+    def get_shadow_value(self, value):
+        """Converts stored value to the value of the shadow column."""
+        return value
+
+    def contribute_to_class(self, cls, name, **kwargs):
+        super().contribute_to_class(cls, name, **kwargs)
+        # Historical models from migrations already have the shadow column in their state
+        if self.indexed and not cls._meta.abstract and cls.__module__ != "__fake__":
+            self.shadow_attname = f"{name}_value"
+            cls.add_to_class(self.shadow_attname, self.get_shadow_field())
+
+    def sync_shadow_value(self, model_instance) -> None:
+        if self.shadow_attname is None:
+            return
+        data = model_instance.__dict__.get(self.attname)
+        if isinstance(data, dict):
+            setattr(model_instance, self.shadow_attname, self.get_shadow_value(data.get('value')))
+
+    def pre_save(self, model_instance, add):
+        self.sync_shadow_value(model_instance)
+        return super().pre_save(model_instance, add)
     
     def get_default_structure(self):
         """Returns the default structure for the lockable field."""
@@ -69,6 +104,8 @@ class LockableFieldBase(models.JSONField):
         # Remove default from kwargs as we handle it in __init__
         if 'default' in kwargs and kwargs['default'] == self.get_default_structure:
             del kwargs['default']
+        if self.indexed:
+            kwargs['indexed'] = True
         return name, path, args, kwargs
 
 
@@ -83,11 +120,17 @@ class LockableFieldDescriptor:
         self.value_type = value_type
         self.validator = validator
         self.enum_class = enum_class
+        self.proxy_key = f"_{field_name}_proxy"
     
     def __get__(self, instance, owner):
         if instance is None:
             return self
-        return LockableFieldProxy(instance, self.attname, self.value_type, self.validator, self.enum_class)
+        # Proxy is created once per instance, copied instances get their own one
+        proxy = instance.__dict__.get(self.proxy_key)
+        if proxy is None or proxy._instance is not instance:
+            proxy = LockableFieldProxy(instance, self.attname, self.value_type, self.validator, self.enum_class)
+            instance.__dict__[self.proxy_key] = proxy
+        return proxy
     
     def __set__(self, instance, value):
         # If value is already a dict with 'value' and 'locked', set it directly
@@ -103,6 +146,7 @@ class LockableFieldProxy:
     """
     Proxy object that provides the interface for interacting with lockable fields.
     """
+    __slots__ = ("_instance", "_field_name", "_value_type", "_validator", "_enum_class", "_field")
     
     def __init__(self, instance, field_name, value_type=None, validator=None, enum_class=None):
         self._instance = instance
@@ -110,11 +154,15 @@ class LockableFieldProxy:
         self._value_type = value_type
         self._validator = validator
         self._enum_class = enum_class
+        self._field = None
     
     def _get_data(self):
         """Get the raw data dictionary from the model instance."""
         # Access the actual field data directly from __dict__ to avoid descriptor recursion
         data = self._instance.__dict__.get(self._field_name)
+        # Data is normalized by from_db_value and the descriptor, so any dict is valid
+        if data.__class__ is dict:
+            return data
         if not isinstance(data, dict) or 'value' not in data or 'locked' not in data:
             # Get the field to access its default value
             field = self._instance._meta.get_field(self._field_name)
@@ -132,8 +180,7 @@ class LockableFieldProxy:
     @property
     def value(self):
         """Get the current value."""
-        data = self._get_data()
-        return data.get('value')
+        return self._get_data()['value']
     
     @value.setter
     def value(self, new_value):
@@ -168,6 +215,9 @@ class LockableFieldProxy:
         
         data['value'] = new_value
         self._set_data(data)
+        if self._field is None:
+            self._field = self._instance._meta.get_field(self._field_name)
+        self._field.sync_shadow_value(self._instance)
     
     def lock(self):
         """Lock the field to prevent modifications."""
@@ -184,8 +234,7 @@ class LockableFieldProxy:
     @property
     def locked(self):
         """Get the current lock state."""
-        data = self._get_data()
-        return data.get('locked', False)
+        return self._get_data()['locked']
     
     def __str__(self):
         return str(self.value)
@@ -231,6 +280,13 @@ class LockableCharField(LockableFieldBase):
     def get_default_value(self):
         return self._default or ""
     
+    def get_shadow_field(self):
+        return models.CharField(max_length=SHADOW_CHAR_MAX_LENGTH, default=self.get_default_value()[:SHADOW_CHAR_MAX_LENGTH], db_index=True, editable=False, verbose_name=self.verbose_name)
+
+    def get_shadow_value(self, value):
+        return str(value if value is not None else "")[:SHADOW_CHAR_MAX_LENGTH]
+    
+
     def contribute_to_class(self, cls, name, **kwargs):
         super().contribute_to_class(cls, name, **kwargs)
         # Store the actual field name (attname) for direct access
@@ -267,6 +323,13 @@ class LockableBoolField(LockableFieldBase):
     def get_default_value(self):
         return self._default or False
     
+    def get_shadow_field(self):
+        return models.BooleanField(default=self.get_default_value(), db_index=True, editable=False, verbose_name=self.verbose_name)
+
+    def get_shadow_value(self, value):
+        return bool(value)
+    
+
     def contribute_to_class(self, cls, name, **kwargs):
         super().contribute_to_class(cls, name, **kwargs)
         # Store the actual field name (attname) for direct access
@@ -285,6 +348,13 @@ class LockableIntegerField(LockableFieldBase):
     def get_default_value(self):
         return self._default or 0
     
+    def get_shadow_field(self):
+        return models.IntegerField(default=self.get_default_value(), db_index=True, editable=False, verbose_name=self.verbose_name)
+
+    def get_shadow_value(self, value):
+        return int(value if value is not None else self.get_default_value())
+    
+
     def contribute_to_class(self, cls, name, **kwargs):
         super().contribute_to_class(cls, name, **kwargs)
         # Store the actual field name (attname) for direct access
@@ -303,6 +373,13 @@ class LockableFloatField(LockableFieldBase):
     def get_default_value(self):
         return self._default or 0.0
     
+    def get_shadow_field(self):
+        return models.FloatField(default=self.get_default_value(), db_index=True, editable=False, verbose_name=self.verbose_name)
+
+    def get_shadow_value(self, value):
+        return float(value if value is not None else self.get_default_value())
+    
+
     def contribute_to_class(self, cls, name, **kwargs):
         super().contribute_to_class(cls, name, **kwargs)
         # Store the actual field name (attname) for direct access
@@ -321,7 +398,26 @@ class LockableDateTimeField(LockableFieldBase):
     def get_default_value(self):
         from datetime import datetime, timezone
         return self._default or datetime(1900, 1, 1, 12, 0, tzinfo=timezone.utc)
-    
+
+    def get_shadow_field(self):
+        return models.DateTimeField(null=True, db_index=True, editable=False, verbose_name=self.verbose_name)
+
+    def get_shadow_value(self, value):
+        """Unknown (default) and unparsable dates are stored as NULL."""
+        from datetime import datetime
+        import django.utils.timezone as timezone
+
+        if isinstance(value, str):
+            try:
+                value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+            except ValueError:
+                return None
+        if not isinstance(value, datetime):
+            return None
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        return None if value == self.get_default_value() else value
+
     def from_db_value(self, value, expression, connection):
         """Convert the database value to a Python object, converting enum values back to enum instances."""
         result = super().from_db_value(value, expression, connection)
@@ -348,6 +444,7 @@ class LockableDateTimeField(LockableFieldBase):
             
             from datetime import datetime
             import django.utils.timezone as timezone
+            from django.conf import settings
             
             # If it's already a datetime, return it
             if isinstance(value, datetime):
@@ -359,7 +456,7 @@ class LockableDateTimeField(LockableFieldBase):
                     # Try parsing ISO format
                     dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
                     # Make it timezone-aware if settings.USE_TZ is True
-                    if timezone.is_naive(dt) and getattr(django.conf.settings, 'USE_TZ', False):
+                    if timezone.is_naive(dt) and getattr(settings, 'USE_TZ', False):
                         dt = timezone.make_aware(dt)
                     return dt
                 except (ValueError, AttributeError):
@@ -420,6 +517,13 @@ class LockableEnumField(LockableFieldBase):
             widget=forms.Select(attrs={'class': 'vSelectField'})
         )
     
+    def get_shadow_field(self):
+        return models.IntegerField(default=self.get_default_value(), db_index=True, editable=False, verbose_name=self.verbose_name)
+
+    def get_shadow_value(self, value):
+        return int(value if value is not None else self.get_default_value())
+    
+
     def contribute_to_class(self, cls, name, **kwargs):
         super().contribute_to_class(cls, name, **kwargs)
         
@@ -510,4 +614,16 @@ class LockableEnumField(LockableFieldBase):
     def deconstruct(self):
         name, path, args, kwargs = super().deconstruct()
         kwargs['enum_class'] = self.enum_class
-        return name, path, args, kwargs
\ No newline at end of file
+        return name, path, args, kwargs
+
+
+def with_shadow_fields(model, field_names:list[str]) -> list[str]:
+    """
+    Adds shadow columns of indexed lockable fields to the field names, for save(update_fields=...) and bulk_update.
+    """
+    output = list(field_names)
+    for field_name in field_names:
+        shadow_attname = getattr(model._meta.get_field(field_name), "shadow_attname", None)
+        if shadow_attname is not None:
+            output.append(shadow_attname)
+    return output
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:13
+
+from django.db import migrations, models
+
+
+NSFW_AGE_RATINGS = [11, 13, 14, 15]
+
+
+def fill_is_nsfw(apps, schema_editor):
+    Manga = apps.get_model("database_manga", "Manga")
+    Chapter = apps.get_model("database_manga", "Chapter")
+    Manga.objects.update(is_nsfw=models.Exists(Chapter.objects.filter(
+        volume__manga=models.OuterRef("pk"),
+        age_rating__value__in=NSFW_AGE_RATINGS,
+    )))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database_manga', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='manga',
+            name='is_nsfw',
+            field=models.BooleanField(db_index=True, default=False, editable=False, verbose_name='database.models.manga.is_nsfw'),
+        ),
+        migrations.RunPython(fill_is_nsfw, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+from django.db import migrations
+from database.manga import search_index
+
+
+def get_value(data):
+    if isinstance(data, dict):
+        return data.get("value") or ""
+    return data or ""
+
+
+def fill_search_index(apps, schema_editor):
+    Manga = apps.get_model("database_manga", "Manga")
+    MangaANLink = apps.get_model("database_manga", "MangaANLink")
+    Volume = apps.get_model("database_manga", "Volume")
+    Chapter = apps.get_model("database_manga", "Chapter")
+    connection = schema_editor.connection
+
+    for id, name, localized_name in Manga.objects.values_list("id", "name", "localized_name").iterator():
+        search_index.index(f"manga:{id}", search_index.MANGA, id, f"{get_value(name)} {get_value(localized_name)}", using=connection)
+    for id, manga_id, name in MangaANLink.objects.values_list("id", "manga_id", "alternative_name").iterator():
+        search_index.index(f"alt:{id}", search_index.MANGA, manga_id, get_value(name), using=connection)
+    for id, name in Volume.objects.values_list("id", "name").iterator():
+        search_index.index(f"volume:{id}", search_index.VOLUME, id, get_value(name), using=connection)
+    for id, name in Chapter.objects.values_list("id", "name").iterator():
+        search_index.index(f"chapter:{id}", search_index.CHAPTER, id, get_value(name), using=connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database_manga', '0002_manga_is_nsfw'),
+    ]
+
+    operations = [
+        migrations.RunSQL(search_index.CREATE_SQL, search_index.DROP_SQL),
+        migrations.RunPython(fill_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:02
+
+import os
+from django.db import migrations, models
+
+
+def fill_file_size(apps, schema_editor):
+    Chapter = apps.get_model("database_manga", "Chapter")
+    for chapter in Chapter.objects.filter(downloaded=True).only("id", "file").iterator():
+        try:
+            size = os.path.getsize(chapter.file)
+        except OSError:
+            continue
+        Chapter.objects.filter(id=chapter.id).update(file_size=size)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database_manga', '0003_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chapter',
+            name='file_size',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='database.models.chapter.file_size'),
+        ),
+        migrations.RunPython(fill_file_size, migrations.RunPython.noop),
+    ]
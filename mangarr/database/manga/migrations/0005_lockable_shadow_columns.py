@@ -0,0 +1,93 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:22
+
+import database.manga.lockable_fields
+import plugins.base
+from django.db import migrations, models
+
+
+def get_value(data, default):
+    if isinstance(data, dict) and data.get("value") is not None:
+        return data["value"]
+    return default
+
+
+def fill_shadow_columns(apps, schema_editor):
+    Manga = apps.get_model("database_manga", "Manga")
+    Volume = apps.get_model("database_manga", "Volume")
+    Chapter = apps.get_model("database_manga", "Chapter")
+
+    Manga.objects.bulk_update([
+        Manga(id=id, name_value=str(get_value(name, ""))[:255], complete_value=bool(get_value(complete, False)))
+        for id, name, complete in Manga.objects.values_list("id", "name", "complete").iterator()
+    ], ["name_value", "complete_value"], batch_size=500)
+
+    Volume.objects.bulk_update([
+        Volume(id=id, number_value=float(get_value(number, 0.0)))
+        for id, number in Volume.objects.values_list("id", "number").iterator()
+    ], ["number_value"], batch_size=500)
+
+    Chapter.objects.bulk_update([
+        Chapter(id=id, number_value=float(get_value(number, 1.0)), age_rating_value=int(get_value(age_rating, 1)))
+        for id, number, age_rating in Chapter.objects.values_list("id", "number", "age_rating").iterator()
+    ], ["number_value", "age_rating_value"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database_manga', '0004_chapter_file_size'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chapter',
+            name='age_rating_value',
+            field=models.IntegerField(db_index=True, default=1, editable=False, verbose_name='database.models.chapter.age_rating'),
+        ),
+        migrations.AddField(
+            model_name='chapter',
+            name='number_value',
+            field=models.FloatField(db_index=True, default=1.0, editable=False, verbose_name='database.models.chapter.number'),
+        ),
+        migrations.AddField(
+            model_name='manga',
+            name='complete_value',
+            field=models.BooleanField(db_index=True, default=False, editable=False, verbose_name='database.models.manga.complete'),
+        ),
+        migrations.AddField(
+            model_name='manga',
+            name='name_value',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255, verbose_name='database.models.manga.name'),
+        ),
+        migrations.AddField(
+            model_name='volume',
+            name='number_value',
+            field=models.FloatField(db_index=True, default=0.0, editable=False, verbose_name='database.models.volume.number'),
+        ),
+        migrations.AlterField(
+            model_name='chapter',
+            name='age_rating',
+            field=database.manga.lockable_fields.LockableEnumField(enum_class=plugins.base.AgeRating, indexed=True, verbose_name='database.models.chapter.age_rating'),
+        ),
+        migrations.AlterField(
+            model_name='chapter',
+            name='number',
+            field=database.manga.lockable_fields.LockableFloatField(indexed=True, verbose_name='database.models.chapter.number'),
+        ),
+        migrations.AlterField(
+            model_name='manga',
+            name='complete',
+            field=database.manga.lockable_fields.LockableBoolField(indexed=True, verbose_name='database.models.manga.complete'),
+        ),
+        migrations.AlterField(
+            model_name='manga',
+            name='name',
+            field=database.manga.lockable_fields.LockableCharField(indexed=True, verbose_name='database.models.manga.name'),
+        ),
+        migrations.AlterField(
+            model_name='volume',
+            name='number',
+            field=database.manga.lockable_fields.LockableFloatField(indexed=True, verbose_name='database.models.volume.number'),
+        ),
+        migrations.RunPython(fill_shadow_columns, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database_manga', '0005_lockable_shadow_columns'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='manga',
+            name='chapters_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64, verbose_name='database.models.manga.chapters_hash'),
+        ),
+        migrations.AddField(
+            model_name='manga',
+            name='source_token',
+            field=models.CharField(blank=True, default='', editable=False, max_length=512, verbose_name='database.models.manga.source_token'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:32
+
+import database.manga.lockable_fields
+import django.utils.timezone
+from datetime import timedelta
+from django.db import migrations, models
+
+
+def fill_next_check(apps, schema_editor):
+    Manga = apps.get_model("database_manga", "Manga")
+    Chapter = apps.get_model("database_manga", "Chapter")
+
+    release_date_field = Chapter._meta.get_field("release_date")
+    Chapter.objects.bulk_update([
+        Chapter(id=id, release_date_value=release_date_field.get_shadow_value(release_date.get("value") if isinstance(release_date, dict) else None))
+        for id, release_date in Chapter.objects.values_list("id", "release_date").iterator()
+    ], ["release_date_value"], batch_size=500)
+
+    # Keeps the previous fixed 24h schedule until the manga is refreshed and its cadence is known
+    Manga.objects.update(next_check=models.F("last_update") + timedelta(hours=24))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database_manga', '0006_manga_source_change_detection'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chapter',
+            name='release_date_value',
+            field=models.DateTimeField(db_index=True, editable=False, null=True, verbose_name='database.models.chapter.release_date'),
+        ),
+        migrations.AddField(
+            model_name='manga',
+            name='next_check',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, editable=False, verbose_name='database.models.manga.next_check'),
+        ),
+        migrations.AlterField(
+            model_name='chapter',
+            name='release_date',
+            field=database.manga.lockable_fields.LockableDateTimeField(indexed=True, verbose_name='database.models.chapter.release_date'),
+        ),
+        migrations.RunPython(fill_next_check, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+NSFW_AGE_RATINGS = [11, 13, 14, 15]
+
+
+def fill_is_nsfw(apps, schema_editor):
+    # 0002 filtered on the JSON value of age_rating, which never matched, the shadow column filled by 0005 is used instead
+    Manga = apps.get_model("database_manga", "Manga")
+    Chapter = apps.get_model("database_manga", "Chapter")
+    Manga.objects.update(is_nsfw=models.Exists(Chapter.objects.filter(
+        volume__manga=models.OuterRef("pk"),
+        age_rating_value__in=NSFW_AGE_RATINGS,
+    )))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database_manga', '0007_manga_next_check'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_is_nsfw, migrations.RunPython.noop),
+    ]
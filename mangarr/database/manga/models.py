@@ -11,9 +11,15 @@ from xml.sax.saxutils import unescape
 from core.utils import get_hash
 from django.utils import timezone
 from .utils import make_valid_filename, BaseModel
+from . import search_index
+from .schedule import get_next_check, RELEASE_HISTORY
 from pathlib import Path
 from datetime import datetime
 import json
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+NSFW_AGE_RATINGS = (AgeRating.MATURE_17_PLUS, AgeRating.R18_PLUS, AgeRating.ADULTS_ONLY_18_PLUS, AgeRating.X_18_PLUS)
 
 # Create your models here.
 class Library(BaseModel):
@@ -95,17 +101,21 @@ class MangaRequest(BaseModel):
 class Manga(BaseModel):
     library = models.ForeignKey(Library, on_delete=models.CASCADE, blank=False, null=False, verbose_name=pgettext("Library field name for Manga", "database.models.manga.library"))
     plugin = models.CharField(max_length=64, choices=get_plugin_choices(), verbose_name=pgettext("Plugin field name for Manga", "database.models.manga.plugin"))
-    name = LockableCharField(verbose_name=pgettext("Name field name for Manga", "database.models.manga.name"))
+    name = LockableCharField(indexed=True, verbose_name=pgettext("Name field name for Manga", "database.models.manga.name"))
     localized_name = LockableCharField(verbose_name=pgettext("Localized name field name for Manga", "database.models.manga.localized_name"))
     description = LockableCharField(verbose_name=pgettext("Description field name for Manga", "database.models.manga.description"))
     genres = LockableListField(verbose_name=pgettext("Genres field name for Manga", "database.models.manga.genres"))
     tags = LockableListField(verbose_name=pgettext("Tags field name for Manga", "database.models.manga.tags"))
     date_added = models.DateTimeField(auto_now_add=True, verbose_name=pgettext("Date added field name for Manga", "database.models.manga.date_added"))
     last_update = models.DateTimeField(auto_now_add=True, verbose_name=pgettext("Last update field name for Manga", "database.models.manga.last_update"))
-    complete = LockableBoolField(verbose_name=pgettext("Complete field name for Manga", "database.models.manga.complete"))
+    complete = LockableBoolField(indexed=True, verbose_name=pgettext("Complete field name for Manga", "database.models.manga.complete"))
     url = models.URLField(verbose_name=pgettext("URL field name for Manga", "database.models.manga.url"), unique=True)
     file_folder = models.CharField(max_length=512, default=FILE_PATH_ROOT, verbose_name=pgettext("Folder field name for Manga", "database.models.manga.folder_path"))
     arguments = models.JSONField(default=dict, verbose_name=pgettext("Arguments JSON field name for Manga", "processes.models.manga.arguments"), blank=True)
+    is_nsfw = models.BooleanField(default=False, db_index=True, editable=False, verbose_name=pgettext("NSFW flag field name for Manga", "database.models.manga.is_nsfw"))
+    source_token = models.CharField(max_length=512, blank=True, default="", editable=False, verbose_name=pgettext("Source token field name for Manga", "database.models.manga.source_token"))
+    chapters_hash = models.CharField(max_length=64, blank=True, default="", editable=False, verbose_name=pgettext("Chapters hash field name for Manga", "database.models.manga.chapters_hash"))
+    next_check = models.DateTimeField(default=timezone.now, db_index=True, editable=False, verbose_name=pgettext("Next check field name for Manga", "database.models.manga.next_check"))
 
     def __str__(self) -> str:
         return self.name.value
@@ -120,11 +130,19 @@ class Manga(BaseModel):
     
     @property
     def nsfw(self) -> bool:
-        for volume in self.volumes.all():
-            for chapter in volume.chapters.all():
-                if chapter.age_rating in (AgeRating.MATURE_17_PLUS, AgeRating.R18_PLUS, AgeRating.ADULTS_ONLY_18_PLUS, AgeRating.X_18_PLUS):
-                    return True
-        return False
+        return self.is_nsfw
+
+    @staticmethod
+    def refresh_nsfw(mangas:models.QuerySet = None) -> None:
+        """
+        Recomputes is_nsfw flag of the mangas (all if None) from age ratings of their chapters.
+        """
+        if mangas is None:
+            mangas = Manga.objects.all()
+        mangas.update(is_nsfw=models.Exists(Chapter.objects.filter(
+            volume__manga=models.OuterRef("pk"),
+            age_rating_value__in=[rating.value for rating in NSFW_AGE_RATINGS],
+        )))
 
     @staticmethod
     def monitor_exist(url:str) -> bool:
@@ -148,17 +166,39 @@ class Manga(BaseModel):
                 self.plugin = choice[0]
     
     def add_alternative_names(self, alternative_names:list):
-        for alternative_name in alternative_names:
+        existing = {link.alternative_name.value for link in self.alternative_names.all()}
+        new_links = []
+        for alternative_name in dict.fromkeys(alternative_names):
+            if alternative_name in existing:
+                continue
             alt_name = MangaANLink()
             alt_name.manga = self
             alt_name.alternative_name.value = alternative_name
-            alt_name.save()
+            new_links.append(alt_name)
+        MangaANLink.objects.bulk_create(new_links)
+        # bulk_create doesn't send post_save
+        for alt_name in new_links:
+            index_alternative_name(MangaANLink, alt_name)
+
+    def schedule_next_check(self, release_dates:list = None, save:bool = True) -> None:
+        """
+        Plans next refresh from release cadence of the manga.
+        Release dates reported by the plugin can be passed in, otherwise the ones of chapters in database are used.
+        """
+        if release_dates is None:
+            release_dates = list(Chapter.objects.filter(volume__manga=self, release_date_value__isnull=False).order_by("-release_date_value").values_list("release_date_value", flat=True)[:RELEASE_HISTORY])
+        else:
+            release_date_field = Chapter._meta.get_field("release_date")
+            release_dates = [date for date in map(release_date_field.get_shadow_value, release_dates) if date is not None]
+        self.next_check = get_next_check(release_dates, self.complete.value, timezone.now())
+        if save:
+            self.save(update_fields=["next_check"])
 
     def update_last_update(self) -> None:
         self.last_update = timezone.now()
-        self.save()
+        self.save(update_fields=["last_update"])
 
-    def update_fields(self, data:dict, force:bool = False) -> None:
+    def update_fields(self, data:dict, force:bool = False, save:bool = True) -> None:
         if data.get("name") is not None:
             self.name.set_value(data.get("name"), force)
 
@@ -223,7 +263,8 @@ class Manga(BaseModel):
                 self.complete.lock()
 
         self.arguments = {**self.arguments, **data}
-        self.save()
+        if save:
+            self.save()
 
     def to_representation(self):
         return {
@@ -302,7 +343,7 @@ class MangaANLink(BaseModel):
 class Volume(BaseModel):
     name = LockableCharField(verbose_name=pgettext("Name field name for Volume", "database.models.volume.name"))
     description = LockableCharField(verbose_name=pgettext("Description field name for Volume", "database.models.volume.description"))
-    number = LockableFloatField(verbose_name=pgettext("Number field name for Volume", "database.models.volume.number"))
+    number = LockableFloatField(indexed=True, verbose_name=pgettext("Number field name for Volume", "database.models.volume.number"))
     manga = models.ForeignKey(Manga, on_delete=models.CASCADE, related_name="volumes", verbose_name=pgettext("Mange FK field name for Volume", "processes.models.volume.manga"))
     arguments = models.JSONField(default=dict, verbose_name=pgettext("Arguments JSON field name for Volume", "processes.models.volume.arguments"), blank=True)
 
@@ -400,7 +441,7 @@ class Chapter(BaseModel):
     localization = LockableCharField(verbose_name=pgettext("Localization field name for Chapter", "database.models.chapter.localization"))
     publisher = LockableListField(verbose_name=pgettext("Publisher field name for Chapter", "database.models.chapter.publisher"))
     imprint = LockableListField(verbose_name=pgettext("Imprint field name for Chapter", "database.models.chapter.imprint"))
-    release_date = LockableDateTimeField(verbose_name=pgettext("Release date field name for Chapter", "database.models.chapter.release_date"))
+    release_date = LockableDateTimeField(indexed=True, verbose_name=pgettext("Release date field name for Chapter", "database.models.chapter.release_date"))
     writer = LockableListField(verbose_name=pgettext("Writer field name for Chapter", "database.models.chapter.writer"))
     penciller = LockableListField(verbose_name=pgettext("Penciller field name for Chapter", "database.models.chapter.penciller"))
     inker = LockableListField(verbose_name=pgettext("Inker field name for Chapter", "database.models.chapter.inker"))
@@ -411,14 +452,15 @@ class Chapter(BaseModel):
     translator = LockableListField(verbose_name=pgettext("Translator field name for Chapter", "database.models.chapter.translator"))
     page_count = LockableIntegerField(default=0, verbose_name=pgettext("Page count field name for Chapter", "database.models.chapter.page_count"))
     format = LockableEnumField(enum_class=Formats, default=Formats.NORMAL, verbose_name=pgettext("Format field name for Chapter", "database.models.chapter.format"))
-    age_rating = LockableEnumField(enum_class=AgeRating, default=AgeRating.UNKNOWN, verbose_name=pgettext("Age rating field name for Chapter", "database.models.chapter.age_rating"))
+    age_rating = LockableEnumField(enum_class=AgeRating, indexed=True, default=AgeRating.UNKNOWN, verbose_name=pgettext("Age rating field name for Chapter", "database.models.chapter.age_rating"))
     isbn = LockableCharField(verbose_name=pgettext("ISBN field name for Chapter", "database.models.chapter.isbn"))
-    number = LockableFloatField(default=1.0, verbose_name=pgettext("Number field name for Chapter", "database.models.chapter.number"))
+    number = LockableFloatField(default=1.0, indexed=True, verbose_name=pgettext("Number field name for Chapter", "database.models.chapter.number"))
     volume = models.ForeignKey(Volume, on_delete=models.CASCADE, related_name="chapters", verbose_name=pgettext("Volume FK field name for Chapter", "database.models.chapter.volume"))
     file = models.CharField(max_length=512, default=FILE_PATH_ROOT, verbose_name=pgettext("File field name for Chapter", "database.models.chapter.file_path"))
     url = models.URLField(verbose_name=pgettext("URL field name for Chapter", "database.models.chapter.url"), unique=True)
     source_url = models.URLField(verbose_name=pgettext("Source URL field name for Chapter", "database.models.chapter.source_url"))
     downloaded = models.BooleanField(default=False, verbose_name=pgettext("Downloaded field name for Chapter", "database.models.chapter.downloaded"))
+    file_size = models.BigIntegerField(default=0, editable=False, verbose_name=pgettext("File size field name for Chapter", "database.models.chapter.file_size"))
     arguments = models.JSONField(default=dict, verbose_name=pgettext("Arguments JSON field name for Chapter", "processes.models.manga.arguments"), blank=True)
 
     @property
@@ -432,7 +474,7 @@ class Chapter(BaseModel):
             return self.name.value
         return f'{self.volume.__str__()} Ch.{self.chapter}'
     
-    def update_fields(self, data:dict, force:bool = False) -> None:
+    def update_fields(self, data:dict, force:bool = False, save:bool = True) -> None:
         if data.get("name") is not None:
             self.name.set_value(data.get("name"), force)
 
@@ -659,7 +701,8 @@ class Chapter(BaseModel):
             self.source_url = data.get("source_url")
             
         self.arguments = {**self.arguments, **data}
-        self.save()
+        if save:
+            self.save()
         
     def to_representation(self):
         return {
@@ -896,4 +939,67 @@ class Chapter(BaseModel):
                     output[field.name] = value
         output["manga_id"] = self.volume.manga.id
         output["cover"] = self.volume.manga.cover
-        return output
\ No newline at end of file
+        return output
+
+def saved_fields_include(update_fields, *field_names) -> bool:
+    return update_fields is None or any(field_name in update_fields for field_name in field_names)
+
+@receiver(post_save, sender=Chapter)
+def chapter_saved(sender, instance, update_fields=None, **kwargs):
+    if not saved_fields_include(update_fields, "age_rating", "volume"):
+        return
+    mangas = Manga.objects.filter(volumes__id=instance.volume_id)
+    if instance.age_rating in NSFW_AGE_RATINGS:
+        mangas.filter(is_nsfw=False).update(is_nsfw=True)
+    else:
+        Manga.refresh_nsfw(mangas.filter(is_nsfw=True))
+
+@receiver(post_delete, sender=Chapter)
+def chapter_deleted(sender, instance, **kwargs):
+    if instance.age_rating in NSFW_AGE_RATINGS:
+        Manga.refresh_nsfw(Manga.objects.filter(volumes__id=instance.volume_id))
+
+@receiver(post_save, sender=Manga)
+def index_manga(sender, instance, update_fields=None, **kwargs):
+    if not saved_fields_include(update_fields, "name", "localized_name"):
+        return
+    search_index.index(f"manga:{instance.id}", search_index.MANGA, instance.id, f"{instance.name.value} {instance.localized_name.value}")
+
+@receiver(post_delete, sender=Manga)
+def unindex_manga(sender, instance, **kwargs):
+    search_index.remove(f"manga:{instance.id}")
+
+@receiver(post_save, sender=MangaANLink)
+def index_alternative_name(sender, instance, **kwargs):
+    search_index.index(f"alt:{instance.id}", search_index.MANGA, instance.manga_id, instance.alternative_name.value)
+
+@receiver(post_delete, sender=MangaANLink)
+def unindex_alternative_name(sender, instance, **kwargs):
+    search_index.remove(f"alt:{instance.id}")
+
+@receiver(post_save, sender=Volume)
+def index_volume(sender, instance, update_fields=None, **kwargs):
+    if not saved_fields_include(update_fields, "name"):
+        return
+    search_index.index(f"volume:{instance.id}", search_index.VOLUME, instance.id, instance.name.value)
+
+@receiver(post_delete, sender=Volume)
+def unindex_volume(sender, instance, **kwargs):
+    search_index.remove(f"volume:{instance.id}")
+
+@receiver(post_save, sender=Chapter)
+def index_chapter(sender, instance, update_fields=None, **kwargs):
+    if not saved_fields_include(update_fields, "name"):
+        return
+    search_index.index(f"chapter:{instance.id}", search_index.CHAPTER, instance.id, instance.name.value)
+
+def index_chapters(chapters) -> None:
+    """
+    Indexes names of chapters saved by bulk_update/bulk_create, which don't send post_save.
+    """
+    for chapter in chapters:
+        index_chapter(Chapter, chapter)
+
+@receiver(post_delete, sender=Chapter)
+def unindex_chapter(sender, instance, **kwargs):
+    search_index.remove(f"chapter:{instance.id}")
@@ -0,0 +1,58 @@
+"""
+Refresh scheduling of manga based on release cadence learned from chapter release dates.
+
+Cadence is the median interval between releases, so a single delayed or batch release doesn't skew it.
+Active series are polled around their expected next release, series without release for several
+cadences (hiatus) and completed series back off to long intervals.
+"""
+from core.settings import REFRESH_DEFAULT_INTERVAL, REFRESH_MIN_INTERVAL, REFRESH_HIATUS_INTERVAL, REFRESH_COMPLETE_INTERVAL, REFRESH_HIATUS_FACTOR
+from datetime import datetime, timedelta
+from statistics import median
+from typing import Iterable, Optional
+
+# Only recent releases matter, old history would hide cadence changes
+RELEASE_HISTORY = 20
+
+def get_cadence(release_dates:list[datetime]) -> Optional[timedelta]:
+    """
+    Returns median interval between releases (releases on the same day count as one) or None without enough history.
+    """
+    days = sorted({date.date(): date for date in sorted(release_dates)}.values())[-RELEASE_HISTORY:]
+    if len(days) < 2:
+        return None
+    return median(later - earlier for earlier, later in zip(days, days[1:]))
+
+def get_next_check(release_dates:Iterable[datetime], complete:bool, now:datetime) -> datetime:
+    """
+    Returns when should the manga be refreshed next.
+
+    Args:
+        release_dates (Iterable[datetime]): Known release dates of the chapters (in any order)
+        complete (bool): Whether the manga is complete
+        now (datetime): Current time
+
+    Returns:
+        datetime: Time of the next refresh
+    """
+    if complete:
+        return now + timedelta(hours=REFRESH_COMPLETE_INTERVAL)
+
+    release_dates = list(release_dates)
+    cadence = get_cadence(release_dates)
+    if cadence is None:
+        return now + timedelta(hours=REFRESH_DEFAULT_INTERVAL)
+
+    min_interval = timedelta(hours=REFRESH_MIN_INTERVAL)
+    hiatus_interval = timedelta(hours=REFRESH_HIATUS_INTERVAL)
+
+    last_release = max(release_dates)
+    if now - last_release > max(cadence * REFRESH_HIATUS_FACTOR, hiatus_interval):
+        return now + hiatus_interval
+
+    expected_release = last_release + cadence
+    if expected_release > now:
+        interval = expected_release - now
+    else:
+        # Release is late, check more often until it shows up
+        interval = cadence / 4
+    return now + max(min_interval, min(interval, hiatus_interval))
@@ -0,0 +1,67 @@
+"""
+Full-text search index over manga, alternative, volume and chapter names.
+
+Names live inside JSON lockable fields, so they are copied into SQLite FTS5 table
+which is kept in sync by signals in models.py. Every indexed name has a key (e.g. "chapter:<uuid>")
+which is hashed into the rowid, so updates and removals don't need to scan the table.
+"""
+from django.db import connection
+import hashlib
+import re
+
+TABLE_NAME = "database_manga_search"
+
+MANGA = "manga"
+VOLUME = "volume"
+CHAPTER = "chapter"
+
+CREATE_SQL = f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE_NAME} USING fts5(kind UNINDEXED, object_id UNINDEXED, name, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+DROP_SQL = f"DROP TABLE IF EXISTS {TABLE_NAME}"
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+def get_rowid(key:str) -> int:
+    return int.from_bytes(hashlib.sha1(key.encode("utf-8")).digest()[:8], "big") & 0x7FFFFFFFFFFFFFFF
+
+def make_match_query(query:str) -> str:
+    """
+    Turns user input into FTS5 query where every word is matched as prefix.
+    """
+    return " ".join(f'"{token}"*' for token in _TOKEN_RE.findall(query))
+
+def index(key:str, kind:str, object_id, name:str, using=None) -> None:
+    """
+    Adds or replaces indexed name, empty names are removed from the index.
+    """
+    using = using or connection
+    rowid = get_rowid(key)
+    with using.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE_NAME} WHERE rowid = %s", [rowid])
+        if name is not None and len(name.strip()) > 0:
+            cursor.execute(f"INSERT INTO {TABLE_NAME} (rowid, kind, object_id, name) VALUES (%s, %s, %s, %s)", [rowid, kind, str(object_id), name])
+
+def remove(key:str, using=None) -> None:
+    using = using or connection
+    with using.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE_NAME} WHERE rowid = %s", [get_rowid(key)])
+
+def clear(using=None) -> None:
+    using = using or connection
+    with using.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE_NAME}")
+
+def search(query:str, kind:str, limit:int = 20, offset:int = 0, using=None) -> list[str]:
+    """
+    Returns ids of objects of the kind matching the query, best (bm25) matches first.
+    """
+    match = make_match_query(query)
+    if len(match) == 0:
+        return []
+    using = using or connection
+    with using.cursor() as cursor:
+        cursor.execute(
+            f"SELECT object_id FROM (SELECT object_id, rank FROM {TABLE_NAME} WHERE {TABLE_NAME} MATCH %s AND kind = %s) "
+            "GROUP BY object_id ORDER BY MIN(rank) LIMIT %s OFFSET %s",
+            [match, kind, limit, offset],
+        )
+        return [row[0] for row in cursor.fetchall()]
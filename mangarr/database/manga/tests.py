@@ -1,3 +1,63 @@
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase
+from core.settings import REFRESH_DEFAULT_INTERVAL, REFRESH_MIN_INTERVAL, REFRESH_HIATUS_INTERVAL, REFRESH_COMPLETE_INTERVAL
+from datetime import datetime, timedelta, timezone
+from .models import Library, Manga, Volume, Chapter
+from .schedule import get_cadence, get_next_check
 
 # Create your tests here.
+class ShadowFieldTests(TestCase):
+    def setUp(self):
+        library = Library.objects.create(name="Shadow")
+        manga = Manga.objects.create(library=library, url="https://example.com/manga", plugin="example")
+        self.volume = Volume.objects.create(manga=manga)
+
+    def test_null_value_saves_field_default(self):
+        # Shadow columns are NOT NULL, plugins returning null must not break the save
+        chapter = Chapter.objects.create(
+            volume=self.volume,
+            url="https://example.com/chapter/1",
+            number={"value": None, "locked": False},
+            age_rating={"value": None, "locked": False},
+        )
+        self.volume.number = {"value": None, "locked": False}
+        self.volume.save()
+
+        self.assertEqual(
+            Chapter.objects.values_list("number_value", "age_rating_value").get(pk=chapter.pk),
+            (1.0, Chapter._meta.get_field("age_rating").get_default_value()),
+        )
+        self.assertEqual(Volume.objects.values_list("number_value", flat=True).get(pk=self.volume.pk), 0.0)
+
+class ScheduleTests(SimpleTestCase):
+    def setUp(self):
+        self.now = datetime(2026, 10, 18, 12, tzinfo=timezone.utc)
+
+    def weekly_releases(self, last_release:datetime, count:int = 6) -> list[datetime]:
+        return [last_release - timedelta(weeks=i) for i in range(count)]
+
+    def test_cadence_ignores_same_day_and_irregular_releases(self):
+        releases = self.weekly_releases(self.now)
+        # Batch release on the same day and one late release don't change the weekly cadence
+        releases += [self.now - timedelta(hours=1), self.now - timedelta(weeks=6, days=3)]
+        self.assertEqual(get_cadence(releases), timedelta(weeks=1))
+        self.assertIsNone(get_cadence([self.now]))
+
+    def test_regular_cadence_checks_at_expected_release(self):
+        releases = self.weekly_releases(self.now - timedelta(days=2))
+        self.assertEqual(get_next_check(releases, False, self.now), self.now + timedelta(days=5))
+
+    def test_late_release_checks_more_often(self):
+        releases = self.weekly_releases(self.now - timedelta(days=8))
+        self.assertEqual(get_next_check(releases, False, self.now), self.now + timedelta(weeks=1) / 4)
+
+    def test_hiatus_backs_off(self):
+        releases = self.weekly_releases(self.now - timedelta(weeks=10))
+        self.assertEqual(get_next_check(releases, False, self.now), self.now + timedelta(hours=REFRESH_HIATUS_INTERVAL))
+
+    def test_fast_cadence_is_limited_by_min_interval(self):
+        releases = [self.now - timedelta(days=i) for i in range(6)]
+        self.assertEqual(get_next_check(releases, False, self.now + timedelta(hours=23)), self.now + timedelta(hours=23 + REFRESH_MIN_INTERVAL))
+
+    def test_unknown_cadence_and_complete(self):
+        self.assertEqual(get_next_check([], False, self.now), self.now + timedelta(hours=REFRESH_DEFAULT_INTERVAL))
+        self.assertEqual(get_next_check(self.weekly_releases(self.now), True, self.now), self.now + timedelta(hours=REFRESH_COMPLETE_INTERVAL))
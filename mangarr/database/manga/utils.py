@@ -1,5 +1,6 @@
 import re
 from django.db import models
+import copy
 import uuid
 
 def make_valid_filename(s: str, replacement: str = "_") -> str:
@@ -19,4 +20,13 @@ def make_valid_filename(s: str, replacement: str = "_") -> str:
 class BaseModel(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     class Meta:
-        abstract = True
\ No newline at end of file
+        abstract = True
+
+    def get_field_snapshot(self) -> dict:
+        """
+        Returns copy of the column values, so changed columns can be found later with get_changed_fields.
+        """
+        return {field.attname: copy.deepcopy(field.value_from_object(self)) for field in self._meta.concrete_fields}
+
+    def get_changed_fields(self, snapshot:dict) -> list[str]:
+        return [field.name for field in self._meta.concrete_fields if field.attname in snapshot and snapshot[field.attname] != field.value_from_object(self)]
\ No newline at end of file
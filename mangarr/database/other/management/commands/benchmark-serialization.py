@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from database.manga.models import Library, Manga, Volume, Chapter
+from plugins.base import Formats, AgeRating
+import time
+
+class Command(BaseCommand):
+    help = "Measures serialization throughput of in-memory chapters (no database access)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chapters", type=int, default=10000, help="Number of chapters to serialize")
+        parser.add_argument("--repeat", type=int, default=5, help="Number of runs, the best one is reported")
+
+    def handle(self, *args, **options):
+        library = Library(name="Benchmark")
+        manga = Manga(library=library, url="https://example.com/manga")
+        manga.name.set_value("Benchmark")
+        volume = Volume(manga=manga)
+        volume.number.set_value(1)
+
+        chapters = []
+        for i in range(options["chapters"]):
+            chapter = Chapter(volume=volume, url=f"https://example.com/chapter/{i}")
+            chapter.name.set_value(f"Chapter {i}")
+            chapter.number.set_value(i)
+            chapter.writer.set_value(["Writer"])
+            chapter.format.set_value(Formats.NORMAL)
+            chapter.age_rating.set_value(AgeRating.EVERYONE)
+            # Chapter has no pending edit, cache it so json_serialized doesn't query the database
+            chapter._state.fields_cache["chapter_edit"] = None
+            chapters.append(chapter)
+
+        benchmarks = {
+            "json_serialized": Chapter.json_serialized,
+            "to_representation": Chapter.to_representation,
+            "get_fields_values_for_xml": Chapter.get_fields_values_for_xml,
+        }
+        for name, method in benchmarks.items():
+            best = None
+            for _ in range(options["repeat"]):
+                start = time.perf_counter()
+                for chapter in chapters:
+                    method(chapter)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            self.stdout.write(f"{name}: {best * 1000:.1f} ms ({len(chapters) / best:,.0f} chapters/s)")
@@ -2,6 +2,8 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.utils.translation import pgettext
 from database.manga.models import Library
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 
 # Create your models here.
 class PermissionCodename:
@@ -49,10 +51,18 @@ class UserProfile(models.Model):
     
     def regenerate_token(self) -> str:
         from core.utils import generate_unique_token
+        from .utils import invalidate_token
+        old_token = self.token
         self.token = generate_unique_token(UserProfile)
         self.save()
+        invalidate_token(old_token)
         return self.token
 
+@receiver(post_delete, sender=UserProfile)
+def user_profile_deleted(sender, instance, **kwargs):
+    from .utils import invalidate_token
+    invalidate_token(instance.token)
+
 class RegisterToken(models.Model):
     token = models.CharField(max_length=64, unique=True, editable=False)
 
@@ -1,3 +1,30 @@
 from django.test import TestCase
+from django.contrib.auth.models import User
+from .utils import get_user_id_by_token
 
 # Create your tests here.
+class TokenCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("token", password="password")
+        self.token = self.user.profile.token
+
+    def test_token_is_resolved_from_cache(self):
+        self.assertEqual(get_user_id_by_token(self.token), self.user.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_id_by_token(self.token), self.user.id)
+        self.assertIsNone(get_user_id_by_token("invalid"))
+
+    def test_regenerated_token_invalidates_old_one(self):
+        get_user_id_by_token(self.token)
+
+        new_token = self.user.profile.regenerate_token()
+
+        self.assertIsNone(get_user_id_by_token(self.token))
+        self.assertEqual(get_user_id_by_token(new_token), self.user.id)
+
+    def test_deleted_user_token_is_invalidated(self):
+        get_user_id_by_token(self.token)
+
+        self.user.delete()
+
+        self.assertIsNone(get_user_id_by_token(self.token))
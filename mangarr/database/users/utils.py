@@ -1,16 +1,72 @@
 from database.users.models import UserProfile
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from core.utils import get_hash
+from typing import Optional
+import threading
+import time
 
-def get_user_by_token(auth_header: str) -> User:
+TOKEN_CACHE_PREFIX = "user_token:"
+# Shared cache is invalidated explicitly, process-local one only lives briefly so other workers notice too
+TOKEN_CACHE_TIMEOUT = 300
+TOKEN_LOCAL_TIMEOUT = 10
+TOKEN_LOCAL_MAX_ENTRIES = 1000
+
+_local_tokens = {}
+_local_tokens_lock = threading.Lock()
+
+def get_bearer_token(auth_header: str) -> Optional[str]:
     if not auth_header or not auth_header.startswith("Bearer "):
         return None
+    return auth_header.removeprefix("Bearer ").strip() or None
 
-    token = auth_header.removeprefix("Bearer ").strip()
-    return UserProfile.objects.filter(token=token).first().user
+def get_request_token(request) -> Optional[str]:
+    """
+    Returns API token from Authorization header (Bearer) or from token GET/POST parameter.
+    """
+    return get_bearer_token(request.headers.get("Authorization")) or request.GET.get("token") or request.POST.get("token")
 
-def validate_token(auth_header: str) -> bool:
-    if not auth_header or not auth_header.startswith("Bearer "):
-        return False
+def get_user_id_by_token(token: str) -> Optional[int]:
+    """
+    Returns id of the user owning the token (None if the token is invalid), without database query for recently used tokens.
+    """
+    if not token:
+        return None
+
+    now = time.monotonic()
+    with _local_tokens_lock:
+        expires, user_id = _local_tokens.get(token, (0, None))
+    if expires > now:
+        return user_id
 
-    token = auth_header.removeprefix("Bearer ").strip()
-    return UserProfile.objects.filter(token=token).exists()
\ No newline at end of file
+    key = f"{TOKEN_CACHE_PREFIX}{get_hash(token)}"
+    user_id = cache.get(key)
+    if user_id is None:
+        user_id = UserProfile.objects.filter(token=token).values_list("user_id", flat=True).first()
+        if user_id is None:
+            return None
+        cache.set(key, user_id, TOKEN_CACHE_TIMEOUT)
+
+    with _local_tokens_lock:
+        if len(_local_tokens) >= TOKEN_LOCAL_MAX_ENTRIES:
+            for expired in [cached for cached, (cached_expires, _) in _local_tokens.items() if cached_expires <= now]:
+                del _local_tokens[expired]
+        if len(_local_tokens) < TOKEN_LOCAL_MAX_ENTRIES:
+            _local_tokens[token] = (now + TOKEN_LOCAL_TIMEOUT, user_id)
+    return user_id
+
+def invalidate_token(token: str) -> None:
+    if not token:
+        return
+    with _local_tokens_lock:
+        _local_tokens.pop(token, None)
+    cache.delete(f"{TOKEN_CACHE_PREFIX}{get_hash(token)}")
+
+def get_user_by_token(auth_header: str) -> User:
+    user_id = get_user_id_by_token(get_bearer_token(auth_header))
+    if user_id is None:
+        return None
+    return User.objects.filter(pk=user_id).first()
+
+def validate_token(auth_header: str) -> bool:
+    return get_user_id_by_token(get_bearer_token(auth_header)) is not None
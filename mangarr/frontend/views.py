@@ -14,6 +14,7 @@ from database.manga.models import Library, Chapter
 from connectors.models import ConnectorBase
 from processes.models import EditChapter, MonitorChapter
 from django.utils.translation import pgettext
+from django.db.models import Count, Prefetch, Q
 
 logger = logging.getLogger(__name__)
 
@@ -299,8 +300,11 @@ def manga_requests(request):
 def manga_monitored(request):
     user = request.user.profile
     plugins = get_plugins()
+    mangas = Manga.objects.filter(library__in=user.allowed_libraries.all()).select_related("library").order_by("name_value")
+    if not user.nsfw_allowed:
+        mangas = mangas.filter(is_nsfw=False)
     return custom_render(request, "manga/monitored.html", {
-        "mangas": sorted([{
+        "mangas": [{
             "name": m.name.value,
             "url": m.arguments.get("url"),
             "cover": m.arguments.get("cover", NO_THUMBNAIL_URL),
@@ -314,9 +318,8 @@ def manga_monitored(request):
                 "name": m.library.name,
                 },
             "complete": m.complete.value,
-            "nsfw": m.nsfw,
-            } for m in Manga.objects.all() if (not m.nsfw or user.nsfw_allowed) and m.library in user.allowed_libraries.all()],
-            key=lambda x: x["name"]),
+            "nsfw": m.is_nsfw,
+            } for m in mangas],
         "libraries": [(l.id, l.name) for l in user.allowed_libraries.all()],
         "plugins": [(f"{category}_{domain}", name) for category, domain, name, _, nsfw in plugins if not nsfw or user.nsfw_allowed],
         "nsfw_allowed": user.nsfw_allowed,
@@ -324,34 +327,36 @@ def manga_monitored(request):
 
 @login_required
 def manga_view(request, id):
-    if not Manga.objects.filter(id=id).exists():
+    manga = Manga.objects.filter(id=id).select_related("library").first()
+    if manga is None:
         return redirect("monitored_mangas")
-    manga = Manga.objects.get(id=id)
-
-    volumes = sorted(
-        [
-            {
-                "chapters": sorted(
-                    [
-                        {
-                            **model_field_to_dict(ch),
-                            "chapter": ch.chapter,
-                            "id": ch.id,
-                            "will_edit": EditChapter.edit_exist(ch),
-                            "will_download": MonitorChapter.objects.filter(url=ch.url).exists()
-                        } for ch in v.chapters.all()
-                    ],
-                    key=lambda a: a.get("chapter")
-                ),
-                "volume": v.volume,
-                "name": v.name.value,
-                "pages": {
-                    "downloaded": len(v.chapters.filter(downloaded=True)),
-                    "of": len(v.chapters.all())},
-                    "id": v.id
-                }
-            for v in manga.volumes.all()
-        ],
-        key=lambda a: a.get("volume")
-    )
-    return custom_render(request, "manga/view.html", {"manga": {**model_field_to_dict(manga), "cover": manga.arguments.get("cover", NO_THUMBNAIL_URL)}, "volumes": volumes, "mangas": [(m.id, str(m)) for m in Manga.objects.exclude(id=manga.id)], "fields": Chapter.get_model_fields()})
\ No newline at end of file
+
+    manga_volumes = manga.volumes.annotate(
+        downloaded_count=Count("chapters", filter=Q(chapters__downloaded=True)),
+        chapter_count=Count("chapters"),
+    ).order_by("number_value").prefetch_related(Prefetch("chapters", queryset=Chapter.objects.order_by("number_value")))
+    manga_chapters = Chapter.objects.filter(volume__manga=manga)
+    editing = set(EditChapter.objects.filter(chapter__in=manga_chapters).values_list("chapter_id", flat=True))
+    downloading = set(MonitorChapter.objects.filter(url__in=manga_chapters.values("url")).values_list("url", flat=True))
+
+    volumes = [
+        {
+            "chapters": [
+                {
+                    **model_field_to_dict(ch),
+                    "chapter": ch.chapter,
+                    "id": ch.id,
+                    "will_edit": ch.id in editing,
+                    "will_download": ch.url in downloading
+                } for ch in v.chapters.all()
+            ],
+            "volume": v.volume,
+            "name": v.name.value,
+            "pages": {
+                "downloaded": v.downloaded_count,
+                "of": v.chapter_count},
+                "id": v.id
+            }
+        for v in manga_volumes
+    ]
+    return custom_render(request, "manga/view.html", {"manga": {**model_field_to_dict(manga), "cover": manga.arguments.get("cover", NO_THUMBNAIL_URL)}, "volumes": volumes, "fields": Chapter.get_model_fields()})
\ No newline at end of file
@@ -7,6 +7,9 @@ import sys
 def main():
     """Run administrative tasks."""
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    # Management commands don't scrape, so they never start the browser (development server still can)
+    if len(sys.argv) > 1 and sys.argv[1] != "runserver":
+        os.environ.setdefault('MANGARR_BROWSER_DISABLED', '1')
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
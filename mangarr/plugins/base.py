@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import Optional, BinaryIO
 from io import BytesIO
 from enum import Enum, unique
 import requests
@@ -7,13 +7,20 @@ import logging
 logger = logging.getLogger(__name__)
 
 NO_THUMBNAIL_URL = "/uploads/static/no_thumbnail.png"
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
 from core.settingz.config import DATETIME_FORMAT
-from .driver_setup import DRIVER
+from core.settingz.downloads import HTTP_RETRY_BACKOFF, HTTP_RETRY_AFTER_MAX
+from core.thread_manager import stop_event
+from .driver_setup import DRIVER, DRIVER_POOL
+from core.http_sessions import get_session, get_host_session
+from .cache import cached_call
 
 def enforce_structure(required_keys):
     def decorator(func):
-        def wrapper(*args, **kwargs):
-            result = func(*args, **kwargs)
+        def call(*args, **kwargs):
+            # Browser used during the call goes back to the pool when the outermost plugin call ends
+            with DRIVER_POOL.lease():
+                result = func(*args, **kwargs)
             def apply_defaults(d):
                 return {**required_keys, **d}
             if isinstance(result, dict):
@@ -22,6 +29,8 @@ def enforce_structure(required_keys):
                 return [apply_defaults(item) if isinstance(item, list) else item for item in result]
             else:
                 raise TypeError("Return must be dicct or list of dicts")
+        def wrapper(*args, **kwargs):
+            return cached_call(func.__name__, args, kwargs, lambda: call(*args, **kwargs))
         wrapper._enforced_structure = required_keys
         return wrapper
     return decorator
@@ -114,6 +123,7 @@ class Status(BaseEnum):
 class MangaPluginBase(ABC, metaclass=EnforceStructureMeta):
     languages = []
     nsfw_only = False
+    max_concurrent_downloads = None
 
     def __init__(self, nsfw_allowed = False, *args, **kwargs):
         self.nsfw_allowed = nsfw_allowed
@@ -121,20 +131,22 @@ class MangaPluginBase(ABC, metaclass=EnforceStructureMeta):
 
         super().__init__(*args, **kwargs)
 
+    @property
+    def session(self) -> requests.Session:
+        """
+        HTTP session shared by all instances of the plugin, connections are kept alive between requests.
+        Plugins can use it for their own requests and set default headers or cookies on it, pages are downloaded through it too.
+        """
+        return get_session(f"plugin:{type(self).__module__}.{type(self).__name__}")
+
     @final
     @staticmethod
     def close_driver() -> None:
         """
-        Closes all the tabs of driver except one
+        Returns driver used by the current thread to the pool, its tabs except one are closed and cookies are deleted
         """
         try:
-            if len(DRIVER.window_handles) > 1:
-                while len(DRIVER.window_handles) > 1:
-                    DRIVER.switch_to.window(DRIVER.window_handles[-1])
-                    DRIVER.close()
-                DRIVER.switch_to.window(DRIVER.window_handles[0])
-            else:
-                DRIVER.delete_all_cookies()
+            DRIVER_POOL.release()
         except Exception as e:
             logger.error(f"Error - {e}")
 
@@ -256,6 +268,22 @@ class MangaPluginBase(ABC, metaclass=EnforceStructureMeta):
         """
         pass
 
+    def get_source_token(self, arguments:dict, previous_token:Optional[str] = None) -> Optional[str]:
+        """
+        Optional cheap check whether the manga changed at the source since the last refresh.
+        Returns token describing current state of the source (ETag, Last-Modified, last chapter id, content hash...).
+        previous_token can be used for a conditional request (If-None-Match, If-Modified-Since, "since" cursor),
+        returning it unchanged means the source was not modified and get_manga and get_chapters are not called at all.
+
+        Args:
+            arguments (dict): Dictionary of arguments (same as for get_manga)
+            previous_token (Optional[str]): Token returned by the previous refresh, None on the first or user requested update
+
+        Returns:
+            Optional[str]: Token of the current state or None if the plugin doesn't support change detection
+        """
+        return None
+
     @final
     @staticmethod
     def get_page_dict() -> dict:
@@ -286,30 +314,60 @@ class MangaPluginBase(ABC, metaclass=EnforceStructureMeta):
 
     @final
     @staticmethod
-    def download_page(url:str, arguments:dict) -> BytesIO:
+    def download_page_to(url:str, arguments:dict, file:BinaryIO, session:Optional[requests.Session] = None) -> bool:
         """
-        Downloads an image from a given URL and returns it as an in-memory binary stream.
+        Downloads an image from a given URL and streams it into the file without buffering the whole response.
 
         Args:
+            url (str): URL of the image
             arguments (dict): Dictionary of arguments
+            file (BinaryIO): Writable (and seekable) binary file the image is written to
+            session (Optional[requests.Session]): Session used for the request (session of the URL's host if None)
 
         Returns:
-            BytesIO: A BytesIO object containing the image data.
-
-        Raises:
-            requests.exceptions.RequestException: If the download fails.
+            bool: True if the image was downloaded, False if all retries failed.
         """
+        session = session or get_host_session(url)
         retries = arguments.get("retries", 5)
         for retry in range(1, retries + 1):
+            retry_after = None
             try:
-                response = requests.get(url, headers=arguments.get("headers"), cookies=arguments.get("cookies"), timeout=((arguments.get("retry_timeout", 5) * retry) + arguments.get("timeout", 10)))
-                response.raise_for_status()
-                return BytesIO(response.content)
+                with session.get(url, headers=arguments.get("headers"), cookies=arguments.get("cookies"), timeout=((arguments.get("retry_timeout", 5) * retry) + arguments.get("timeout", 10)), stream=True) as response:
+                    retry_after = response.headers.get("Retry-After")
+                    response.raise_for_status()
+                    file.seek(0)
+                    file.truncate()
+                    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        file.write(chunk)
+                return True
             except Exception as e:
                 if retry >= retries:
                     logger.error(f"Error occured while trying to download page - {e}")
-                    return None
+                    return False
                 logger.debug(f"Downloading page errored - {e}")
                 logger.debug("Retrying download...")
                 logger.debug(f"Retry {retry} of {retries}")
-        return None
\ No newline at end of file
+                delay = HTTP_RETRY_BACKOFF * (2 ** (retry - 1))
+                if retry_after is not None and retry_after.isdigit():
+                    delay = max(delay, min(int(retry_after), HTTP_RETRY_AFTER_MAX))
+                if stop_event.wait(delay):
+                    return False
+        return False
+
+    @final
+    @staticmethod
+    def download_page(url:str, arguments:dict) -> BytesIO:
+        """
+        Downloads an image from a given URL and returns it as an in-memory binary stream.
+
+        Args:
+            arguments (dict): Dictionary of arguments
+
+        Returns:
+            BytesIO: A BytesIO object containing the image data.
+        """
+        stream = BytesIO()
+        if not MangaPluginBase.download_page_to(url, arguments, stream):
+            return None
+        stream.seek(0)
+        return stream
@@ -0,0 +1,92 @@
+"""
+Cache of plugin responses (search results, manga metadata, chapter lists).
+
+Responses are stored in the "plugins" Django cache under key made from the plugin class, method and arguments,
+every method has its own timeout (see PLUGIN_CACHE_TIMEOUTS), methods without timeout are never cached.
+Keys are versioned (see core.cache.versioned_key), invalidate drops responses of all plugins at once when plugins change.
+"""
+from contextlib import contextmanager
+from django.core.cache import caches
+from core.settingz.caches import PLUGIN_CACHE_ALIAS, PLUGIN_CACHE_TIMEOUTS
+from core.cache import versioned_key, bump_version
+import hashlib
+import json
+import threading
+
+import logging
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+CACHE_NAMESPACE = "plugins"
+
+_stats = {}
+_stats_lock = threading.Lock()
+_local = threading.local()
+
+def make_key(method:str, args:tuple, kwargs:dict) -> str:
+    plugin, arguments = args[0], args[1:]
+    payload = json.dumps([getattr(plugin, "nsfw_allowed", False), arguments, kwargs], sort_keys=True, default=str)
+    digest = hashlib.sha256(payload.encode()).hexdigest()
+    return f"plugin:{type(plugin).__module__}.{type(plugin).__qualname__}:{method}:{digest}"
+
+def _count(method:str, hit:bool) -> None:
+    with _stats_lock:
+        counters = _stats.setdefault(method, {"hits": 0, "misses": 0})
+        counters["hits" if hit else "misses"] += 1
+
+def get_stats() -> dict:
+    """
+    Returns hits and misses per plugin method (counted since the process started).
+    """
+    with _stats_lock:
+        return {method: dict(counters) for method, counters in _stats.items()}
+
+def invalidate() -> None:
+    """
+    Drops cached responses of all plugins, called when plugins are downloaded, deleted or loaded.
+    """
+    try:
+        bump_version(CACHE_NAMESPACE)
+    except Exception as e:
+        logger.warning(f"Plugin cache unavailable - {e}")
+
+@contextmanager
+def skip_cache():
+    """
+    Plugin calls inside are always made live (their responses are still cached for others).
+    """
+    previous = getattr(_local, "skip", False)
+    _local.skip = True
+    try:
+        yield
+    finally:
+        _local.skip = previous
+
+def cached_call(method:str, args:tuple, kwargs:dict, call):
+    """
+    Returns cached response of the plugin method or calls it and caches the response.
+    Exceptions are not cached and errors of the cache backend never fail the call.
+    """
+    timeout = PLUGIN_CACHE_TIMEOUTS.get(method, 0)
+    if timeout <= 0 or len(args) == 0:
+        return call()
+
+    cache = caches[PLUGIN_CACHE_ALIAS]
+    try:
+        key = versioned_key(CACHE_NAMESPACE, make_key(method, args, kwargs))
+        result = _MISSING if getattr(_local, "skip", False) else cache.get(key, _MISSING)
+    except Exception as e:
+        logger.warning(f"Plugin cache unavailable - {e}")
+        return call()
+    if result is not _MISSING:
+        _count(method, True)
+        return result
+    _count(method, False)
+
+    result = call()
+    try:
+        cache.set(key, result, timeout)
+    except Exception as e:
+        logger.warning(f"Plugin cache unavailable - {e}")
+    return result
@@ -2,8 +2,8 @@ import os
 import tempfile
 import shutil
 import zipfile
-import requests
 from core.settings import PLUGINS_DIR
+from core.http_sessions import get_host_session
 from .manager import update_downloaded_metadata
 
 import logging
@@ -20,7 +20,7 @@ def download_plugin(repo, category, domain, version, branch="main"):
         zip_path = os.path.join(tmpdir, "plugin.zip")
 
         # Download ZIP
-        r = requests.get(url)
+        r = get_host_session(url).get(url)
         r.raise_for_status()
         with open(zip_path, "wb") as f:
             f.write(r.content)
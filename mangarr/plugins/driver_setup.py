@@ -1,10 +1,18 @@
-
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
+from contextlib import contextmanager
+import atexit
+from core.settingz.browser import DRIVER_POOL_SIZE, DRIVER_CHECKOUT_TIMEOUT, DRIVER_IDLE_TIMEOUT
+from core.thread_manager import stop_event, register_thread
+from urllib.parse import urlparse
+import os
+import shutil
 import tempfile
+import threading
+import time
+
+import logging
+logger = logging.getLogger(__name__)
 
-options = Options()
-arguments = [
+ARGUMENTS = [
     "--headless=new",
     "--disable-gpu",
     "--no-sandbox",
@@ -21,9 +29,295 @@ arguments = [
     "--disable-notifications",
     "--disable-software-rasterizer",
 ]
-for argument in arguments:
-    options.add_argument(argument)
 
-temp_data_dir = tempfile.mkdtemp()
-options.add_argument(f"--user-data-dir={temp_data_dir}")
-DRIVER = webdriver.Chrome(options=options)
\ No newline at end of file
+REAP_INTERVAL = 30
+
+# Set by manage.py, management commands never need the browser
+BROWSER_DISABLED_ENV = "MANGARR_BROWSER_DISABLED"
+
+class DriverUnavailable(Exception):
+    pass
+
+class _PooledDriver:
+    def __init__(self, driver, data_dir:str):
+        self.driver = driver
+        self.data_dir = data_dir
+        self.owner = None
+        self.last_used = time.monotonic()
+        # Origins visited during the lease, their storage is cleared when the browser is returned
+        self.origins = set()
+        # Leased inside lease(), the scope returns it, browsers leased outside are reclaimed by the reaper once left unused
+        self.scoped = True
+        # Taken back by the reaper, thread which leased it checks out another one
+        self.revoked = False
+
+def get_origin(url:str) -> str | None:
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.netloc:
+        return None
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+def create_driver() -> _PooledDriver:
+    # Selenium is imported only when the first browser starts, importing plugins stays cheap
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+
+    options = Options()
+    for argument in ARGUMENTS:
+        options.add_argument(argument)
+
+    data_dir = tempfile.mkdtemp()
+    options.add_argument(f"--user-data-dir={data_dir}")
+    try:
+        return _PooledDriver(webdriver.Chrome(options=options), data_dir)
+    except Exception:
+        shutil.rmtree(data_dir, ignore_errors=True)
+        raise
+
+class DriverPool:
+    """
+    Bounded pool of headless browsers, started on first use and shut down after being idle for a while.
+
+    Every thread leases its own browser (see current), so searches and downloads can scrape in parallel.
+    Browser is cleaned (extra tabs, cookies, cache and storage of visited sites) when it is returned, so the next caller starts fresh.
+    """
+
+    def __init__(self, size:int, checkout_timeout:float, idle_timeout:float):
+        self.size = max(1, size)
+        self.checkout_timeout = checkout_timeout
+        self.idle_timeout = idle_timeout
+        self._idle = []
+        self._leased = {}
+        self._running = 0
+        self._condition = threading.Condition()
+        self._local = threading.local()
+        self._reaper = None
+
+    def checkout(self):
+        """
+        Returns healthy browser, waits for a free one when all of them are in use.
+
+        Raises:
+            DriverUnavailable: No browser was freed in time
+        """
+        return self._checkout().driver
+
+    def _checkout(self) -> _PooledDriver:
+        deadline = time.monotonic() + self.checkout_timeout
+        while True:
+            pooled = self._acquire(deadline)
+            if pooled is None:
+                pooled = self._start()
+            elif not self._is_healthy(pooled):
+                logger.warning("Browser stopped responding, replacing it")
+                self._discard(pooled)
+                continue
+
+            pooled.owner = threading.current_thread()
+            pooled.scoped = True
+            pooled.revoked = False
+            with self._condition:
+                self._leased[id(pooled.driver)] = pooled
+            return pooled
+
+    def checkin(self, driver) -> None:
+        with self._condition:
+            pooled = self._leased.pop(id(driver), None)
+        if pooled is None:
+            return
+        try:
+            self._reset(pooled)
+        except Exception as e:
+            logger.warning(f"Browser couldn't be cleaned, shutting it down - {e}")
+            self._discard(pooled)
+            return
+        pooled.owner = None
+        pooled.last_used = time.monotonic()
+        with self._condition:
+            self._idle.append(pooled)
+            self._condition.notify()
+
+    def current(self):
+        """
+        Browser leased by the current thread, it is checked out on first use.
+        """
+        pooled = getattr(self._local, "pooled", None)
+        if pooled is None or pooled.revoked:
+            pooled = self._local.pooled = self._checkout()
+            pooled.scoped = getattr(self._local, "depth", 0) > 0
+        pooled.last_used = time.monotonic()
+        return pooled.driver
+
+    def record_visit(self, url:str) -> None:
+        """
+        Remembers origin of the page opened by the current thread, so its storage is cleared on release.
+        """
+        pooled = getattr(self._local, "pooled", None)
+        origin = get_origin(url)
+        if pooled is not None and origin is not None:
+            pooled.origins.add(origin)
+
+    def release(self) -> None:
+        """
+        Returns browser leased by the current thread (if any) to the pool.
+        """
+        pooled = getattr(self._local, "pooled", None)
+        if pooled is not None:
+            self._local.pooled = None
+            if not pooled.revoked:
+                self.checkin(pooled.driver)
+
+    @contextmanager
+    def lease(self):
+        """
+        Scope of the thread's lease, browser used inside is released when the outermost scope ends.
+        Nothing is started if the browser isn't used.
+        """
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
+        pooled = getattr(self._local, "pooled", None)
+        if pooled is not None:
+            # Browser leased before the scope is returned with it
+            pooled.scoped = True
+        try:
+            yield
+        finally:
+            self._local.depth = depth
+            if depth == 0:
+                self.release()
+
+    def reap(self) -> None:
+        """
+        Shuts down browsers idle for longer than idle timeout, browsers leased by threads that already ended
+        and browsers leased outside lease() which weren't used for longer than idle timeout.
+        """
+        now = time.monotonic()
+        with self._condition:
+            expired = [pooled for pooled in self._idle if now - pooled.last_used > self.idle_timeout]
+            self._idle = [pooled for pooled in self._idle if pooled not in expired]
+            orphaned = [pooled for pooled in self._leased.values() if pooled.owner is not None and not pooled.owner.is_alive()]
+            abandoned = [pooled for pooled in self._leased.values() if not pooled.scoped and pooled not in orphaned and now - pooled.last_used > self.idle_timeout]
+            for pooled in orphaned + abandoned:
+                pooled.revoked = True
+                del self._leased[id(pooled.driver)]
+        for pooled in abandoned:
+            logger.warning(f"Browser leased by thread {pooled.owner.name} outside of lease() wasn't used for {self.idle_timeout} seconds, taking it back")
+        for pooled in expired + orphaned + abandoned:
+            self._discard(pooled)
+
+    def close(self) -> None:
+        """
+        Shuts down all browsers, including leased ones.
+        """
+        with self._condition:
+            running = self._idle + list(self._leased.values())
+            self._idle = []
+            self._leased.clear()
+        for pooled in running:
+            self._discard(pooled)
+
+    def _acquire(self, deadline:float):
+        """
+        Takes idle browser or reserves slot for a new one (returns None).
+        """
+        with self._condition:
+            while True:
+                if len(self._idle) > 0:
+                    return self._idle.pop()
+                if self._running < self.size:
+                    self._running += 1
+                    return None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise DriverUnavailable(f"No browser was freed in {self.checkout_timeout} seconds")
+                self._condition.wait(remaining)
+
+    def _start(self) -> _PooledDriver:
+        try:
+            if os.environ.get(BROWSER_DISABLED_ENV) == "1":
+                raise DriverUnavailable("Browser is not available in management commands")
+            pooled = create_driver()
+        except Exception:
+            with self._condition:
+                self._running -= 1
+                self._condition.notify()
+            raise
+        logger.debug("Started browser")
+        self._start_reaper()
+        return pooled
+
+    def _discard(self, pooled:_PooledDriver) -> None:
+        try:
+            pooled.driver.quit()
+        except Exception as e:
+            logger.debug(f"Error while shutting down browser - {e}")
+        shutil.rmtree(pooled.data_dir, ignore_errors=True)
+        logger.debug("Shut down browser")
+        with self._condition:
+            self._running -= 1
+            self._condition.notify()
+
+    @staticmethod
+    def _is_healthy(pooled:_PooledDriver) -> bool:
+        try:
+            return len(pooled.driver.window_handles) > 0
+        except Exception:
+            return False
+
+    @staticmethod
+    def _reset(pooled:_PooledDriver) -> None:
+        """
+        Closes extra tabs and clears cookies, cache and storage (local, session, IndexedDB, service workers...).
+        Raises when the browser can't be cleaned, it is shut down then, so nothing leaks to the next lease.
+        """
+        driver = pooled.driver
+        handles = driver.window_handles
+        origins = set(pooled.origins)
+        for handle in reversed(handles):
+            driver.switch_to.window(handle)
+            origins.add(get_origin(driver.current_url))
+            if handle != handles[0]:
+                driver.close()
+        driver.switch_to.window(handles[0])
+        driver.get("about:blank")
+        for origin in origins - {None}:
+            driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+        # Cache and cookies of every site, not only of the visited ones
+        driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        pooled.origins.clear()
+
+    def _start_reaper(self) -> None:
+        with self._condition:
+            if self._reaper is not None:
+                return
+            self._reaper = threading.Thread(target=self._reap_forever, name="driver-reaper", daemon=True)
+        register_thread(self._reaper)
+        self._reaper.start()
+
+    def _reap_forever(self) -> None:
+        while not stop_event.wait(min(REAP_INTERVAL, self.idle_timeout)):
+            try:
+                self.reap()
+            except Exception as e:
+                logger.error(f"Error - {e}")
+        self.close()
+
+class DriverProxy:
+    """
+    Stands in for the WebDriver, every thread works with the browser it leased from the pool.
+    """
+
+    def __getattr__(self, name):
+        attribute = getattr(DRIVER_POOL.current(), name)
+        if name == "get":
+            def get(url, *args, **kwargs):
+                DRIVER_POOL.record_visit(url)
+                return attribute(url, *args, **kwargs)
+            return get
+        return attribute
+
+DRIVER_POOL = DriverPool(DRIVER_POOL_SIZE, DRIVER_CHECKOUT_TIMEOUT, DRIVER_IDLE_TIMEOUT)
+# Browsers would outlive the process otherwise
+atexit.register(DRIVER_POOL.close)
+DRIVER = DriverProxy()
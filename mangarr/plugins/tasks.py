@@ -18,6 +18,7 @@ def background_update():
 
 from .loader import load_plugin
 from .base import MangaPluginBase
+from .cache import invalidate as invalidate_plugin_cache
 def load_downloaded_plugins():
     logger.info("Loading downloaded plugins...")
 
@@ -35,6 +36,8 @@ def load_downloaded_plugins():
         if metadata["downloaded_version"] is not None:
             load_and_register_plugin(metadata["category"], metadata["domain"])
 
+    # Responses cached by code of the previous run (in Redis) may come from older versions of the plugins
+    invalidate_plugin_cache()
     logger.info("Plugins loaded!")
     plugins_loaded.set()
 
@@ -1,5 +1,6 @@
-import json, requests, logging
+import json, logging
 from core.settings import PLUGINS_METADATA_PATH, PLUGIN_REGISTRY, plugins_loaded
+from core.http_sessions import get_host_session
 from .base import MangaPluginBase
 logger = logging.getLogger(__name__)
 
@@ -71,7 +72,7 @@ def get_plugins() -> list:
 def fetch_repo_manifest(repo):
     try:
         url = f"https://raw.githubusercontent.com/{repo}/main/manifest.json"
-        r = requests.get(url)
+        r = get_host_session(url).get(url)
         r.raise_for_status()
         return r.json()
     except Exception as e:
@@ -91,7 +92,7 @@ def get_downloaded_metadata() -> list[dict]:
     
 def fetch_json_list(url):
     try:
-        r = requests.get(url)
+        r = get_host_session(url).get(url)
         r.raise_for_status()
         return r.json()
     except Exception as e:
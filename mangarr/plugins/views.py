@@ -6,6 +6,7 @@ from django.contrib import messages
 from plugins.downloader import download_plugin
 from core.settings import PLUGINS_DIR, plugin_change_state, plugin_changed
 from .manager import update_downloaded_metadata
+from .cache import invalidate as invalidate_plugin_cache
 from .utils import load_metadata
 import logging
 logger = logging.getLogger(__name__)
@@ -36,6 +37,7 @@ def download_plugin_view(request, domain):
     try:
         download_plugin(plugin["source"], plugin["category"], plugin["domain"], plugin["version"])
         plugin_changed()
+        invalidate_plugin_cache()
         logger.info(f"Plugin '{plugin['name']}' downloaded.")
     except Exception as e:
         logger.error(f"Error - {e}")
@@ -57,6 +59,7 @@ def delete_plugin_view(request, domain):
             messages.success(request, f"Plugin '{plugin['name']}' deleted.")
             update_downloaded_metadata(domain)
             plugin_changed()
+            invalidate_plugin_cache()
         else:
             messages.warning(request, "Plugin not downloaded.")
     except Exception as e:
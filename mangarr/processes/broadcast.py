@@ -0,0 +1,117 @@
+from core.thread_manager import stop_event
+from core.redis_client import get_redis
+from django.db import close_old_connections
+from websockets.consumers import notify_clients, get_state, STATE_SECTIONS_KEY, STATE_DOWNLOADING_KEY, STATE_VERSION_KEY
+from typing import Callable
+import threading
+import copy
+import json
+import time
+
+import logging
+logger = logging.getLogger(__name__)
+
+BROADCAST_INTERVAL = 1.0
+# At most 4 progress updates per second
+PROGRESS_INTERVAL = 0.25
+
+# Jobs whose progress this process has in the shared state
+_published_jobs = set()
+_publish_lock = threading.Lock()
+
+def publish(data:dict) -> None:
+    """
+    Stores sections of the shared state and sends the whole state to all clients.
+
+    Only the given sections are replaced, so processes publishing different sections don't overwrite each other.
+    "downloading" holds jobs of this process only, they are merged with jobs of the other processes.
+    Every publish increments the shared version, so clients can drop updates which arrive out of order.
+    """
+    with _publish_lock:
+        pipeline = get_redis().pipeline()
+        sections = {name: json.dumps(value) for name, value in data.items() if name not in ("version", "downloading")}
+        if len(sections) > 0:
+            pipeline.hset(STATE_SECTIONS_KEY, mapping=sections)
+
+        jobs = data.get("downloading")
+        if jobs is not None:
+            now = time.time()
+            if len(jobs) > 0:
+                pipeline.hset(STATE_DOWNLOADING_KEY, mapping={job_id: json.dumps({**progress, "updated": now}) for job_id, progress in jobs.items()})
+            finished = _published_jobs - jobs.keys()
+            if len(finished) > 0:
+                pipeline.hdel(STATE_DOWNLOADING_KEY, *finished)
+
+        pipeline.incr(STATE_VERSION_KEY)
+        pipeline.execute()
+        if jobs is not None:
+            _published_jobs.clear()
+            _published_jobs.update(jobs.keys())
+    notify_clients(get_state())
+
+class Broadcaster:
+    """
+    Coalesces state changes into periodic websocket broadcasts.
+
+    Signal handlers only mark the state dirty (O(1)), background thread (see run) then builds
+    one snapshot for all the changes since the last broadcast and publishes it if it differs from the last one.
+    """
+
+    def __init__(self, snapshot:Callable[[], dict], interval:float = BROADCAST_INTERVAL):
+        self.snapshot = snapshot
+        self.interval = interval
+        self._dirty = threading.Event()
+        self._last_sent = None
+
+    def mark_dirty(self) -> None:
+        self._dirty.set()
+
+    def flush(self) -> None:
+        self._dirty.clear()
+        data = self.snapshot()
+        if data != self._last_sent:
+            publish(data)
+            self._last_sent = data
+
+    def run(self) -> None:
+        while not stop_event.is_set():
+            if not self._dirty.wait(timeout=1):
+                continue
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error - {e}")
+            finally:
+                close_old_connections()
+            # Changes made meanwhile are sent together with the next snapshot
+            stop_event.wait(self.interval)
+
+class DownloadProgress:
+    """
+    Progress of chapters being downloaded, keyed by job id so concurrent downloads don't overwrite each other.
+    """
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self.broadcaster = Broadcaster(self.snapshot, PROGRESS_INTERVAL)
+
+    def report(self, job_id, current:int, of:int, name:str = "") -> None:
+        with self._lock:
+            self._jobs[str(job_id)] = {
+                "current": current,
+                "of": of,
+                "name": name,
+            }
+        self.broadcaster.mark_dirty()
+
+    def finish(self, job_id) -> None:
+        with self._lock:
+            self._jobs.pop(str(job_id), None)
+        self.broadcaster.mark_dirty()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"downloading": copy.deepcopy(self._jobs)}
+
+download_progress = DownloadProgress()
@@ -0,0 +1,140 @@
+from functools import cache
+from io import BytesIO
+from pathlib import Path
+from typing import Optional, BinaryIO
+import copy
+import logging
+import shutil
+import struct
+import time
+import zipfile
+
+COPY_CHUNK_SIZE = 1024 * 1024
+COMIC_INFO_NAME = "ComicInfo.xml"
+
+_FLAG_ENCRYPTED = 0x01
+_FLAG_DATA_DESCRIPTOR = 0x08
+
+logger = logging.getLogger(__name__)
+
+# Raw copy relies on internals of zipfile, which can change between Python versions
+_RAW_COPY_INTERNALS = ("_FH_FILENAME_LENGTH", "_FH_EXTRA_FIELD_LENGTH", "structFileHeader", "sizeFileHeader")
+
+@cache
+def raw_copy_supported() -> bool:
+    """
+    Checks once per process that entries copied without decompressing make a valid archive with this zipfile.
+    When they don't, entries are copied through the public zipfile API instead.
+    """
+    if not all(hasattr(zipfile, name) for name in _RAW_COPY_INTERNALS):
+        logger.warning("zipfile internals changed, archive entries will be recompressed when copied")
+        return False
+    entries = {"1.png": b"page" * 1000, COMIC_INFO_NAME: b"<ComicInfo/>" * 100}
+    try:
+        source_buffer, target_buffer = BytesIO(), BytesIO()
+        with zipfile.ZipFile(source_buffer, "w") as source:
+            source.writestr("1.png", entries["1.png"], compress_type=zipfile.ZIP_STORED)
+            source.writestr(COMIC_INFO_NAME, entries[COMIC_INFO_NAME], compress_type=zipfile.ZIP_DEFLATED)
+        with zipfile.ZipFile(source_buffer, "r") as source, CbzWriter(target_buffer) as target:
+            for info in source.infolist():
+                target._copy_raw(source, info)
+        with zipfile.ZipFile(target_buffer, "r") as target:
+            if target.testzip() is None and {name: target.read(name) for name in target.namelist()} == entries:
+                return True
+    except Exception as e:
+        logger.debug(f"Raw copy of archive entries failed - {e}")
+    logger.warning("Raw copy of archive entries doesn't work with this zipfile, entries will be recompressed when copied")
+    return False
+
+class CbzWriter:
+    """
+    Writes CBZ archive entry by entry. Images are already compressed, so they are stored as they are
+    and copied in chunks, only ComicInfo.xml is deflated.
+    """
+
+    def __init__(self, path:Path|BinaryIO):
+        self._zip = zipfile.ZipFile(path, "w", zipfile.ZIP_STORED)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self) -> None:
+        self._zip.close()
+
+    def add_page(self, name:str, source:Path) -> None:
+        """
+        Copies page file into the archive without compressing it.
+        """
+        info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+        info.compress_type = zipfile.ZIP_STORED
+        with open(source, "rb") as src, self._zip.open(info, "w") as dest:
+            shutil.copyfileobj(src, dest, COPY_CHUNK_SIZE)
+
+    def add_comic_info(self, xml:str) -> None:
+        self._zip.writestr(COMIC_INFO_NAME, xml, compress_type=zipfile.ZIP_DEFLATED)
+
+    def _can_copy_raw(self, info:zipfile.ZipInfo) -> bool:
+        return (
+            raw_copy_supported()
+            and not info.flag_bits & _FLAG_ENCRYPTED
+            and info.file_size < zipfile.ZIP64_LIMIT
+            and info.compress_size < zipfile.ZIP64_LIMIT
+            and self._zip.fp.tell() < zipfile.ZIP64_LIMIT
+        )
+
+    def copy_entry(self, source:zipfile.ZipFile, info:zipfile.ZipInfo) -> None:
+        """
+        Copies entry from another archive without decompressing it.
+        Encrypted and zip64 entries (or all entries, when raw copy doesn't work with this Python) are copied through zipfile as a fallback.
+        """
+        if self._can_copy_raw(info):
+            self._copy_raw(source, info)
+        else:
+            with source.open(info) as src, self._zip.open(copy.copy(info), "w") as dest:
+                shutil.copyfileobj(src, dest, COPY_CHUNK_SIZE)
+
+    def _copy_raw(self, source:zipfile.ZipFile, info:zipfile.ZipInfo) -> None:
+        source.fp.seek(info.header_offset)
+        header = struct.unpack(zipfile.structFileHeader, source.fp.read(zipfile.sizeFileHeader))
+        source.fp.seek(header[zipfile._FH_FILENAME_LENGTH] + header[zipfile._FH_EXTRA_FIELD_LENGTH], 1)
+
+        target = copy.copy(info)
+        # Sizes and CRC are known, so they go to the local header and source's data descriptor is dropped
+        target.flag_bits &= ~_FLAG_DATA_DESCRIPTOR
+        target.header_offset = self._zip.fp.tell()
+        self._zip.fp.write(target.FileHeader(False))
+
+        remaining = info.compress_size
+        while remaining > 0:
+            chunk = source.fp.read(min(COPY_CHUNK_SIZE, remaining))
+            if not chunk:
+                raise zipfile.BadZipFile(f"Truncated entry {info.filename}")
+            self._zip.fp.write(chunk)
+            remaining -= len(chunk)
+
+        self._zip.filelist.append(target)
+        self._zip.NameToInfo[target.filename] = target
+        self._zip.start_dir = self._zip.fp.tell()
+        self._zip._didModify = True
+
+def read_comic_info(path:Path) -> Optional[bytes]:
+    with zipfile.ZipFile(path, "r") as cbz:
+        try:
+            return cbz.read(COMIC_INFO_NAME)
+        except KeyError:
+            return None
+
+def replace_comic_info(source:Path, target:Path, xml:str) -> None:
+    """
+    Writes copy of the source archive with new ComicInfo.xml to target.
+    Pages are copied as they are stored, nothing is extracted or recompressed.
+    """
+    with zipfile.ZipFile(source, "r") as original, CbzWriter(target) as cbz:
+        for info in original.infolist():
+            if info.filename == COMIC_INFO_NAME:
+                continue
+            cbz.copy_entry(original, info)
+        cbz.add_comic_info(xml)
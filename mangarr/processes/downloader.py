@@ -0,0 +1,92 @@
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from pathlib import Path
+from typing import Iterator, Optional
+from plugins.base import MangaPluginBase
+from core.settings import PAGE_WORKERS, HOST_REQUEST_INTERVAL
+from core.thread_manager import stop_event
+import threading
+import time
+
+import logging
+logger = logging.getLogger(__name__)
+
+class HostThrottle:
+    """
+    Spaces out request starts per host so concurrent downloads stay polite.
+    """
+
+    def __init__(self, interval:float):
+        self.interval = interval
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host:str) -> None:
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+_throttle = HostThrottle(HOST_REQUEST_INTERVAL)
+
+_plugin_limits = {}
+_plugin_limits_lock = threading.Lock()
+
+def get_plugin_limit(plugin:MangaPluginBase) -> int:
+    limit = plugin.max_concurrent_downloads or PAGE_WORKERS
+    return max(1, min(limit, PAGE_WORKERS))
+
+def get_plugin_semaphore(plugin_key:str, limit:int) -> threading.Semaphore:
+    """
+    Returns semaphore shared by every download of the plugin, so the limit holds across chapters.
+    """
+    with _plugin_limits_lock:
+        if plugin_key not in _plugin_limits:
+            _plugin_limits[plugin_key] = threading.BoundedSemaphore(limit)
+        return _plugin_limits[plugin_key]
+
+def _download(plugin:MangaPluginBase, semaphore:threading.Semaphore, page:dict, path:Path) -> Optional[Path]:
+    if stop_event.is_set():
+        return None
+    with semaphore:
+        _throttle.wait(urlparse(page['url']).netloc)
+        try:
+            with open(path, "wb") as file:
+                downloaded = plugin.download_page_to(page['url'], page.get('arguments', {}), file, plugin.session)
+        except OSError as e:
+            logger.error(f"Error writing page to {path} - {e}")
+            downloaded = False
+    if not downloaded:
+        path.unlink(missing_ok=True)
+        return None
+    return path
+
+def fetch_pages(plugin:MangaPluginBase, plugin_key:str, pages:list[dict], folder:Path, indexes:Optional[list[int]] = None) -> Iterator[tuple[int, Optional[Path]]]:
+    """
+    Downloads pages concurrently straight to files and yields them in their original order.
+
+    Args:
+        plugin (MangaPluginBase): Plugin used for downloading
+        plugin_key (str): Key of the plugin, used to share the concurrency limit
+        pages (list[dict]): Pages returned by plugin's get_pages
+        folder (Path): Staging folder the pages are written to
+        indexes (Optional[list[int]]): Indexes of pages to download (all pages if None)
+
+    Yields:
+        tuple[int, Optional[Path]]: Index of the page and path to its file (None if download failed)
+    """
+    folder.mkdir(parents=True, exist_ok=True)
+    if indexes is None:
+        indexes = range(len(pages))
+    limit = get_plugin_limit(plugin)
+    semaphore = get_plugin_semaphore(plugin_key, limit)
+    executor = ThreadPoolExecutor(max_workers=limit, thread_name_prefix=f"pages-{plugin_key}")
+    try:
+        futures = [(i, executor.submit(_download, plugin, semaphore, pages[i], folder / f"{i}.page")) for i in indexes]
+        for i, future in futures:
+            yield i, future.result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
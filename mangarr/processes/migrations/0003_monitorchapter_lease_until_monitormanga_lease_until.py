@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('processes', '0002_alter_monitorchapter_manga_alter_monitormanga_manga'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='monitorchapter',
+            name='lease_until',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='processes.models.process_base.lease_until'),
+        ),
+        migrations.AddField(
+            model_name='monitormanga',
+            name='lease_until',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='processes.models.process_base.lease_until'),
+        ),
+    ]
@@ -0,0 +1,129 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:09
+
+import django.utils.timezone
+from datetime import timedelta
+from django.db import migrations, models
+
+
+def schedule_failed_processes(apps, schema_editor):
+    # Processes that failed before keep their one hour retry delay
+    for model_name in ("MonitorManga", "MonitorChapter"):
+        model = apps.get_model("processes", model_name)
+        for process in model.objects.filter(last_run__isnull=False).only("pk", "last_run"):
+            model.objects.filter(pk=process.pk).update(not_before=process.last_run + timedelta(hours=1))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database_manga', '0001_initial'),
+        ('processes', '0003_monitorchapter_lease_until_monitormanga_lease_until'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='editchapter',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0, verbose_name='processes.models.job_base.attempts'),
+        ),
+        migrations.AddField(
+            model_name='editchapter',
+            name='last_run',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='processes.models.process_base.last_run'),
+        ),
+        migrations.AddField(
+            model_name='editchapter',
+            name='lease_until',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='processes.models.process_base.lease_until'),
+        ),
+        migrations.AddField(
+            model_name='editchapter',
+            name='not_before',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='processes.models.job_base.not_before'),
+        ),
+        migrations.AddField(
+            model_name='editchapter',
+            name='priority',
+            field=models.IntegerField(default=0, verbose_name='processes.models.job_base.priority'),
+        ),
+        migrations.AddField(
+            model_name='editchapter',
+            name='state',
+            field=models.CharField(choices=[('queued', 'processes.models.job_state.queued'), ('running', 'processes.models.job_state.running')], default='queued', max_length=16, verbose_name='processes.models.job_base.state'),
+        ),
+        migrations.AddField(
+            model_name='monitorchapter',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0, verbose_name='processes.models.job_base.attempts'),
+        ),
+        migrations.AddField(
+            model_name='monitorchapter',
+            name='not_before',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='processes.models.job_base.not_before'),
+        ),
+        migrations.AddField(
+            model_name='monitorchapter',
+            name='priority',
+            field=models.IntegerField(default=0, verbose_name='processes.models.job_base.priority'),
+        ),
+        migrations.AddField(
+            model_name='monitorchapter',
+            name='state',
+            field=models.CharField(choices=[('queued', 'processes.models.job_state.queued'), ('running', 'processes.models.job_state.running')], default='queued', max_length=16, verbose_name='processes.models.job_base.state'),
+        ),
+        migrations.AddField(
+            model_name='monitormanga',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0, verbose_name='processes.models.job_base.attempts'),
+        ),
+        migrations.AddField(
+            model_name='monitormanga',
+            name='not_before',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='processes.models.job_base.not_before'),
+        ),
+        migrations.AddField(
+            model_name='monitormanga',
+            name='priority',
+            field=models.IntegerField(default=0, verbose_name='processes.models.job_base.priority'),
+        ),
+        migrations.AddField(
+            model_name='monitormanga',
+            name='state',
+            field=models.CharField(choices=[('queued', 'processes.models.job_state.queued'), ('running', 'processes.models.job_state.running')], default='queued', max_length=16, verbose_name='processes.models.job_base.state'),
+        ),
+        migrations.AlterField(
+            model_name='monitorchapter',
+            name='lease_until',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='processes.models.process_base.lease_until'),
+        ),
+        migrations.AlterField(
+            model_name='monitormanga',
+            name='lease_until',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='processes.models.process_base.lease_until'),
+        ),
+        migrations.AddIndex(
+            model_name='editchapter',
+            index=models.Index(fields=['state', '-priority', 'not_before'], name='editchapter_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='editchapter',
+            index=models.Index(fields=['state', 'lease_until'], name='editchapter_lease_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='monitorchapter',
+            index=models.Index(fields=['state', '-priority', 'not_before'], name='monitorchapter_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='monitorchapter',
+            index=models.Index(fields=['state', 'lease_until'], name='monitorchapter_lease_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='monitormanga',
+            index=models.Index(fields=['state', '-priority', 'not_before'], name='monitormanga_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='monitormanga',
+            index=models.Index(fields=['state', 'lease_until'], name='monitormanga_lease_idx'),
+        ),
+        migrations.RunPython(schedule_failed_processes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('processes', '0004_editchapter_attempts_editchapter_last_run_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='editchapter',
+            name='last_error',
+            field=models.TextField(blank=True, default='', verbose_name='processes.models.job_base.last_error'),
+        ),
+        migrations.AddField(
+            model_name='monitorchapter',
+            name='last_error',
+            field=models.TextField(blank=True, default='', verbose_name='processes.models.job_base.last_error'),
+        ),
+        migrations.AddField(
+            model_name='monitormanga',
+            name='last_error',
+            field=models.TextField(blank=True, default='', verbose_name='processes.models.job_base.last_error'),
+        ),
+        migrations.AlterField(
+            model_name='editchapter',
+            name='state',
+            field=models.CharField(choices=[('queued', 'processes.models.job_state.queued'), ('running', 'processes.models.job_state.running'), ('dead', 'processes.models.job_state.dead')], default='queued', max_length=16, verbose_name='processes.models.job_base.state'),
+        ),
+        migrations.AlterField(
+            model_name='monitorchapter',
+            name='state',
+            field=models.CharField(choices=[('queued', 'processes.models.job_state.queued'), ('running', 'processes.models.job_state.running'), ('dead', 'processes.models.job_state.dead')], default='queued', max_length=16, verbose_name='processes.models.job_base.state'),
+        ),
+        migrations.AlterField(
+            model_name='monitormanga',
+            name='state',
+            field=models.CharField(choices=[('queued', 'processes.models.job_state.queued'), ('running', 'processes.models.job_state.running'), ('dead', 'processes.models.job_state.dead')], default='queued', max_length=16, verbose_name='processes.models.job_base.state'),
+        ),
+    ]
@@ -1,14 +1,16 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils.translation import pgettext
 from database.manga.models import Manga, Volume, Chapter, Library
 from plugins.base import MangaPluginBase
 from plugins.utils import get_plugin_by_key
-from core.settings import FILE_PATH_ROOT, CACHE_FILE_PATH_ROOT
+from plugins.cache import skip_cache
+from plugins.driver_setup import DRIVER_POOL
+from core.settings import FILE_PATH_ROOT, CACHE_FILE_PATH_ROOT, MAX_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY, JOB_LEASE
+from contextlib import nullcontext
 import hashlib
+import json
+import random
 from pathlib import Path
-import shutil
-import zipfile
-import time
 import os
 from django.utils import timezone
 from datetime import timedelta
@@ -17,6 +19,10 @@ from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from database.manga.utils import make_valid_filename
 from .utils import convert_datetime, move_file
+from .downloader import fetch_pages
+from .cbz import CbzWriter, read_comic_info, replace_comic_info
+from .broadcast import Broadcaster, download_progress
+from .staging import ChapterStaging
 from django.db.models import Q
 import logging
 logger = logging.getLogger(__name__)
@@ -37,14 +43,148 @@ def make_json_serializable(value):
     return value
 
 # Create your models here.
-class ProcessBase(models.Model):
+class JobState(models.TextChoices):
+    QUEUED = "queued", pgettext("Job state queued", "processes.models.job_state.queued")
+    RUNNING = "running", pgettext("Job state running", "processes.models.job_state.running")
+    DEAD = "dead", pgettext("Job state dead", "processes.models.job_state.dead")
+
+PRIORITY_NORMAL = 0
+PRIORITY_USER = 10
+
+def get_retry_delay(attempts:int) -> timedelta:
+    """
+    Exponential backoff with jitter for job that failed for the attempts time
+    """
+    delay = min(RETRY_BASE_DELAY * (2 ** max(attempts - 1, 0)), RETRY_MAX_DELAY)
+    return timedelta(seconds=random.uniform(delay / 2, delay))
+
+class JobQuerySet(models.QuerySet):
+    def pending(self):
+        """Jobs waiting in queue or being processed"""
+        return self.filter(state__in=(JobState.QUEUED, JobState.RUNNING))
+
+    def due(self, now:datetime.datetime = None):
+        """Jobs that can be picked by worker right now, in the order they should run"""
+        now = now or timezone.now()
+        return self.filter(
+            Q(state=JobState.QUEUED, not_before__lte=now) |
+            Q(state=JobState.RUNNING, lease_until__lt=now)
+        ).order_by("-priority", "not_before")
+
+    def next_due_time(self) -> datetime.datetime | None:
+        """Time when the earliest queued job becomes due or lease of the earliest running job expires (its worker died)"""
+        times = self.aggregate(
+            queued=models.Min("not_before", filter=Q(state=JobState.QUEUED)),
+            expired=models.Min("lease_until", filter=Q(state=JobState.RUNNING)),
+        )
+        due_times = [due_time for due_time in times.values() if due_time is not None]
+        return min(due_times) if len(due_times) > 0 else None
+
+class JobBase(models.Model):
+    state = models.CharField(max_length=16, choices=JobState.choices, default=JobState.QUEUED, verbose_name=pgettext("Job state field name", "processes.models.job_base.state"))
+    priority = models.IntegerField(default=PRIORITY_NORMAL, verbose_name=pgettext("Job priority field name", "processes.models.job_base.priority"))
+    attempts = models.PositiveIntegerField(default=0, verbose_name=pgettext("Job attempts field name", "processes.models.job_base.attempts"))
+    not_before = models.DateTimeField(default=timezone.now, verbose_name=pgettext("Job not before field name", "processes.models.job_base.not_before"))
+    lease_until = models.DateTimeField(blank=True, null=True, verbose_name=pgettext("Lease until field name", "processes.models.process_base.lease_until"))
+    last_run = models.DateTimeField(blank=True, null=True, verbose_name=pgettext("Last run field name", "processes.models.process_base.last_run"))
+    last_error = models.TextField(blank=True, default="", verbose_name=pgettext("Job last error field name", "processes.models.job_base.last_error"))
+
+    objects = JobQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+        indexes = [
+            models.Index(fields=["state", "-priority", "not_before"], name="%(class)s_due_idx"),
+            models.Index(fields=["state", "lease_until"], name="%(class)s_lease_idx"),
+        ]
+
+    def claim(self, lease:timedelta = timedelta(seconds=JOB_LEASE)) -> bool:
+        """
+        Atomically takes the job for the current worker
+
+        Args:
+            lease (timedelta): How long is the job reserved (in case the worker dies), renewed by renew_lease
+
+        Returns:
+            bool: True if the job was claimed by this call
+        """
+        now = timezone.now()
+        lease_until = now + lease
+        claimed = type(self).objects.filter(pk=self.pk).due(now).update(
+            state=JobState.RUNNING,
+            lease_until=lease_until,
+            attempts=models.F("attempts") + 1,
+        )
+        if claimed == 1:
+            self.state = JobState.RUNNING
+            self.lease_until = lease_until
+            self.attempts += 1
+            return True
+        return False
+
+    def renew_lease(self, lease:timedelta = timedelta(seconds=JOB_LEASE)) -> bool:
+        """
+        Extends the lease of the job claimed by the current worker
+
+        Returns:
+            bool: False if the job was finished, failed or claimed by another worker meanwhile
+        """
+        lease_until = timezone.now() + lease
+        renewed = type(self).objects.filter(pk=self.pk, state=JobState.RUNNING, lease_until=self.lease_until).update(lease_until=lease_until)
+        if renewed == 1:
+            self.lease_until = lease_until
+            return True
+        return False
+
+    def fail(self, error:Exception|str) -> None:
+        """
+        Records the error and returns the job to the queue with exponential backoff.
+        After MAX_ATTEMPTS the job is marked as dead and is not run again until retried manually.
+        """
+        now = timezone.now()
+        self.last_run = now
+        self.last_error = f"{error}"
+        self.lease_until = None
+        if self.attempts >= MAX_ATTEMPTS:
+            logger.warning(f"Job {self} failed {self.attempts} times, giving up")
+            self.state = JobState.DEAD
+        else:
+            self.state = JobState.QUEUED
+            self.not_before = now + get_retry_delay(self.attempts)
+        self.save()
+
+    def retry(self) -> None:
+        """
+        Puts the job (e.g. dead one) back to the queue to be run as soon as possible
+        """
+        self.state = JobState.QUEUED
+        self.attempts = 0
+        self.last_error = ""
+        self.not_before = timezone.now()
+        self.lease_until = None
+        self.save()
+
+    def json_serialized(self) -> dict:
+        return {
+            "id": self.pk,
+            "type": type(self).__name__,
+            "name": f"{self}",
+            "state": self.state,
+            "priority": self.priority,
+            "attempts": self.attempts,
+            "max_attempts": MAX_ATTEMPTS,
+            "last_error": self.last_error,
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+            "not_before": self.not_before.isoformat() if self.not_before else None,
+        }
+
+class ProcessBase(JobBase):
     plugin = models.CharField(verbose_name=pgettext("Plugin field name", "processes.models.process_base.plugin"))
     url = models.URLField(verbose_name=pgettext("URL field name", "processes.models.process_base.url"), unique=True)
-    last_run = models.DateTimeField(blank=True, null=True, verbose_name=pgettext("Last run field name", "processes.models.process_base.last_run"))
     arguments = models.JSONField(default=dict, verbose_name=pgettext("Arguments JSON field name", "processes.models.process_base.arguments"), blank=True)
     manga = models.ForeignKey(Manga, on_delete=models.CASCADE, blank=True, null=True, verbose_name=pgettext("Monitor manga name", "processes.models.monitor.manga"))
     
-    class Meta:
+    class Meta(JobBase.Meta):
         abstract = True
 
     def get_plugin(self) -> MangaPluginBase:
@@ -70,62 +210,124 @@ class MonitorManga(ProcessBase):
     def update(self):
         try:
             plugin = self.get_plugin()
-            manga_data = plugin.get_manga(self.arguments)
 
-            manga, manga_created = Manga.objects.get_or_create(url=manga_data.get("url"), library=self.library)
+            # User requested update gets no previous token, so the plugin reports the current state unconditionally
+            previous_token = (self.manga.source_token or None) if self.is_refresh() else None
+            # Not a structured call, so the browser it may use is returned to the pool here
+            with DRIVER_POOL.lease():
+                source_token = plugin.get_source_token(self.arguments, previous_token) or ""
+            if self.is_refresh() and len(source_token) > 0 and source_token == self.manga.source_token:
+                # Source reports nothing new, the manga doesn't have to be fetched at all
+                self.manga.last_update = timezone.now()
+                self.manga.schedule_next_check(save=False)
+                self.manga.save(update_fields=["last_update", "next_check"])
+                self.delete()
+                return
+
+            # Cached responses could be older than the change the source just reported, or the refresh user asked for
+            with skip_cache() if len(source_token) > 0 or not self.is_refresh() else nullcontext():
+                manga_data = plugin.get_manga(self.arguments)
+                chapters = convert_datetime(plugin.get_chapters(manga_data))
+
+            chapters_hash = get_hash(json.dumps(chapters, sort_keys=True, default=str))
+            unique_chapters = self.get_unique_chapters(chapters)
+            # Same chapters as last time still need update when some of them lost their row (deleted monitor, reset chapter)
+            chapters_changed = not self.is_refresh() or chapters_hash != self.manga.chapters_hash or self.has_missing_chapters(unique_chapters)
+
+            with transaction.atomic():
+                manga = self.update_manga(manga_data, chapters, source_token, chapters_hash)
+                if chapters_changed:
+                    self.update_chapters(manga, unique_chapters)
+                self.delete()
 
-            if manga_created:
-                manga.set_file_folder_path(self.arguments.get("name"))
-                manga.choose_plugin(self.plugin)
-
-            manga.update_fields({
-                **self.arguments,
-                **manga_data,
-            })
-
-            seen_urls = set()
-            unique_chapters = []
-
-            for ch_data in sorted(plugin.get_chapters(manga_data), key=lambda x: (float(x.get("volume_number")), float(x.get("chapter_number")))):
-                url = ch_data.get("url")
-                if not url or url in seen_urls:
-                    continue
-                seen_urls.add(url)
-                unique_chapters.append(ch_data)
-
-            # Step 2: Get existing MonitorChapter URLs from DB
-            existing_urls = set(
-                MonitorChapter.objects
-                .filter(url__in=seen_urls, manga=manga)
-                .values_list("url", flat=True)
-            )
-
-            # Step 3: Filter out existing and prepare new instances
-            new_chapters = []
-            for ch_data in unique_chapters:
-                url = ch_data["url"]
-                if url in existing_urls:
-                    continue
-
-                chapter = MonitorChapter(
-                    url=url,
-                    manga=manga,
-                    plugin=self.plugin,
-                    arguments=convert_datetime(ch_data)
-                )
-                new_chapters.append(chapter)
-
-            MonitorChapter.objects.bulk_create(new_chapters, batch_size=100)
+        except Exception as e:
+            self.fail(e)
+            logger.error(f"Error - {e}")
 
-            self.delete()
+    def is_refresh(self) -> bool:
+        """
+        Scheduled refresh of already existing manga, only these can be short-circuited by source token or chapters hash.
+        Monitors requested by user always do the full update.
+        """
+        return self.manga is not None and self.priority < PRIORITY_USER
 
-            if self.manga is not None:
-                self.manga.update_last_update()
+    @staticmethod
+    def get_unique_chapters(chapters:list[dict]) -> list[dict]:
+        seen_urls = set()
+        unique_chapters = []
+
+        for ch_data in sorted(chapters, key=lambda x: (float(x.get("volume_number")), float(x.get("chapter_number")))):
+            url = ch_data.get("url")
+            if not url or url in seen_urls:
+                continue
+            seen_urls.add(url)
+            unique_chapters.append(ch_data)
+        return unique_chapters
 
-        except Exception as e:
-            self.last_run = timezone.now()
-            self.save()
-            logger.error(f"Error - {e}")
+    @staticmethod
+    def has_missing_chapters(chapters:list[dict]) -> bool:
+        """
+        Whether some of the chapters is neither downloaded nor queued for download.
+        """
+        urls = [ch_data["url"] for ch_data in chapters]
+        known = set(Chapter.objects.filter(url__in=urls, downloaded=True).values_list("url", flat=True))
+        known.update(MonitorChapter.objects.filter(url__in=urls).values_list("url", flat=True))
+        return len(known) < len(urls)
+
+    def update_manga(self, manga_data:dict, chapters:list[dict], source_token:str = "", chapters_hash:str = "") -> Manga:
+        manga, manga_created = Manga.objects.get_or_create(url=manga_data.get("url"), library=self.library)
+        snapshot = manga.get_field_snapshot()
+
+        if manga_created:
+            manga.set_file_folder_path(self.arguments.get("name"))
+            manga.choose_plugin(self.plugin)
+
+        manga.update_fields({
+            **self.arguments,
+            **manga_data,
+        }, save=False)
+        manga.last_update = timezone.now()
+        manga.source_token = source_token
+        manga.chapters_hash = chapters_hash
+        manga.schedule_next_check([ch_data.get("release_date") for ch_data in chapters], save=False)
+        manga.save(update_fields=manga.get_changed_fields(snapshot))
+        return manga
+
+    def update_chapters(self, manga:Manga, chapters:list[dict]) -> None:
+        """
+        Queues download of new chapters and refreshes metadata of already downloaded ones in place.
+        Only rows which actually changed are written.
+        """
+        urls = [ch_data["url"] for ch_data in chapters]
+        downloaded = {chapter.url: chapter for chapter in Chapter.objects.filter(url__in=urls, downloaded=True)}
+        monitored = dict(MonitorChapter.objects.filter(url__in=urls).values_list("url", "arguments"))
+
+        monitors = []
+        for ch_data in chapters:
+            url = ch_data["url"]
+            chapter = downloaded.get(url)
+            if chapter is not None:
+                snapshot = chapter.get_field_snapshot()
+                chapter.update_fields(ch_data, save=False)
+                changed_fields = chapter.get_changed_fields(snapshot)
+                if len(changed_fields) > 0:
+                    chapter.save(update_fields=changed_fields)
+                continue
+
+            if monitored.get(url) == ch_data:
+                continue
+
+            monitors.append(MonitorChapter(
+                url=url,
+                manga=manga,
+                plugin=self.plugin,
+                arguments=ch_data
+            ))
+
+        MonitorChapter.objects.bulk_create(monitors, batch_size=100, update_conflicts=True, unique_fields=["url"], update_fields=["arguments"])
+        # bulk_create doesn't send post_save
+        if len(monitors) > 0:
+            queue_broadcaster.mark_dirty()
 
 class ChapterDownloaded(Exception):
     pass
@@ -143,11 +345,7 @@ class MonitorChapter(ProcessBase):
             chapter_data = self.arguments
 
             volume_number = float(chapter_data.get("volume_number", 1.0))
-            volume = None
-            for v in Volume.objects.filter(manga=self.manga):
-                if v.number.value == volume_number:
-                    volume = v
-                    break
+            volume = Volume.objects.filter(manga=self.manga, number_value=volume_number).first()
 
             if volume is None:
                 volume = Volume()
@@ -175,20 +373,29 @@ class MonitorChapter(ProcessBase):
             chapter.page_count.set_value(len(chapter_pages), force=True)
             chapter.page_count.lock()
 
-            with zipfile.ZipFile(chapter_cache_file_path_name, 'w', zipfile.ZIP_DEFLATED) as cbz:
+            # Pages downloaded by previous attempts are kept, only the missing ones are fetched
+            staging = ChapterStaging(self.pk, len(chapter_pages))
+            failed_pages = []
+            try:
+                download_progress.report(self.pk, len(staging.pages), len(chapter_pages), str(self))
+                for i, page_path in fetch_pages(plugin, self.plugin, chapter_pages, staging.folder, staging.missing()):
+                    if page_path is None:
+                        failed_pages.append(i + 1)
+                        continue
+                    staging.add(i, page_path)
+                    download_progress.report(self.pk, len(staging.pages), len(chapter_pages), str(self))
+            finally:
+                download_progress.finish(self.pk)
+
+            if not staging.is_complete():
+                raise PageWasNone(f"Pages {', '.join(map(str, failed_pages))} failed to download, {len(staging.pages)} of {len(chapter_pages)} pages are kept for the next attempt")
+
+            with CbzWriter(chapter_cache_file_path_name) as cbz:
                 width = len(str(len(chapter_pages)))
-                for i, page in enumerate(chapter_pages):
-                    page_stream = plugin.download_page(page['url'], page.get('arguments', {}))
-                    if page_stream is None:
-                        raise PageWasNone(f"Page {i} was None, skipping chapter will retry later")
-                    filename = f"{i+1:0{width}}.png"
-                    cbz.writestr(filename, page_stream.getvalue())
-                    on_download(i+1, len(chapter_pages))
-                    # Delay for 1 second between downloads
-                    time.sleep(0.5)
-
-                cbz.writestr("ComicInfo.xml", chapter.create_xml())
-            on_download(0, 0)
+                for i, page_path in enumerate(staging.ordered_pages()):
+                    cbz.add_page(f"{i+1:0{width}}.png", page_path)
+                cbz.add_comic_info(chapter.create_xml())
+            staging.remove()
 
             chapter_file_folder = Path(chapter.volume.manga.folder)
             chapter_file_folder.mkdir(exist_ok=True)
@@ -197,6 +404,7 @@ class MonitorChapter(ProcessBase):
             try:
                 move_file(chapter_cache_file_path_name, chapter_file_path_name)
                 chapter.file = f"{chapter_file_path_name}"
+                chapter.file_size = chapter_file_path_name.stat().st_size
                 chapter.downloaded = True
                 chapter.save()
             except Exception as e:
@@ -204,9 +412,6 @@ class MonitorChapter(ProcessBase):
 
             self.delete()
 
-            # Delay for 10 seconds
-            time.sleep(10)
-
         except ChapterDownloaded:
             raise ChapterDownloaded
 
@@ -214,13 +419,13 @@ class MonitorChapter(ProcessBase):
             raise ChapterHadNoPages
 
         except Exception as e:
-            self.last_run = timezone.now()
-            self.save()
+            self.fail(e)
             logger.error(f"Error - {e}")
 
-class EditChapter(models.Model):
+class EditChapter(JobBase):
     chapter = models.OneToOneField(Chapter, on_delete=models.CASCADE, verbose_name=pgettext("Chapter FK name", "processes.models.edit_chapter.chapter"), related_name="chapter_edit")
 
+
     @staticmethod
     def edit_exist(chapter:Chapter) -> bool:
         return EditChapter.objects.filter(chapter__pk=chapter.pk).exists()
@@ -233,40 +438,30 @@ class EditChapter(models.Model):
             logger.error("Error path is not file")
             self.delete()
             return
-        cache_folder_hash = get_hash(chapter.url)
-
-        cache_dir = Path(CACHE_FILE_PATH_ROOT) / cache_folder_hash
-        cache_dir.mkdir(parents=True, exist_ok=True)
-
-        temp_cbz_path = cache_dir / f"{cache_folder_hash}.cbz"
-
-        with zipfile.ZipFile(original_path, 'r') as original_cbz:
-            logger.debug("Extracting chapter...")
-            original_cbz.extractall(cache_dir)
-
-        comic_info_path = cache_dir / "ComicInfo.xml"
-        if comic_info_path.exists():
-            logger.debug("Unlinking ComicInfo.xml...")
-            comic_info_path.unlink()
-
-        logger.debug("Creating new ComicInfo.xml...")
-        comic_info_path.write_text(chapter.create_xml(), encoding="utf-8")
-
-        with zipfile.ZipFile(temp_cbz_path, "w", zipfile.ZIP_DEFLATED) as new_cbz:
-            logger.debug("Making new cbz...")
-            for file_path in cache_dir.rglob('*'):
-                if file_path.is_file() and not file_path.samefile(temp_cbz_path):
-                    arcname = file_path.relative_to(cache_dir)
-                    new_cbz.write(file_path, arcname)
-
         chapter_file_folder = Path(chapter.volume.manga.folder)
         chapter_file_folder.mkdir(exist_ok=True)
         chapter_file_path_name = chapter_file_folder / chapter.get_file_name()
 
+        comic_info = chapter.create_xml()
+        if read_comic_info(original_path) == comic_info.encode("utf-8"):
+            if original_path == chapter_file_path_name:
+                logger.debug("ComicInfo.xml is unchanged, skipping...")
+                self.delete()
+                return
+            temp_cbz_path = original_path
+        else:
+            cache_dir = Path(CACHE_FILE_PATH_ROOT)
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            temp_cbz_path = cache_dir / f"{get_hash(chapter.url)}.cbz"
+
+            logger.debug("Making new cbz...")
+            replace_comic_info(original_path, temp_cbz_path, comic_info)
+
         try:
             logger.debug("Moving cbz...")
             move_file(temp_cbz_path, chapter_file_path_name)
             chapter.file = f"{chapter_file_path_name}"
+            chapter.file_size = chapter_file_path_name.stat().st_size
             chapter.save()
             if original_path.exists() and original_path.is_file() and not original_path.samefile(chapter_file_path_name):
                 logger.debug("Removing old cbz...")
@@ -275,13 +470,21 @@ class EditChapter(models.Model):
             logger.error(f"Error - {e}")
 
         self.delete()
-        # Delay for 1 second
-        time.sleep(1)
 
     def __str__(self) -> str:
         return f"{self.chapter}"
 
-from websockets.consumers import notify_clients
+def queue_snapshot() -> dict:
+    return {
+        "scanning": {
+            "manga": MonitorManga.objects.pending().count(),
+            "chapters": MonitorChapter.objects.pending().count()
+        },"editing": {
+            "chapters": EditChapter.objects.pending().count()
+        },
+    }
+
+queue_broadcaster = Broadcaster(queue_snapshot)
 
 @receiver(post_save, sender=MonitorManga)
 @receiver(post_delete, sender=MonitorManga)
@@ -290,22 +493,4 @@ from websockets.consumers import notify_clients
 @receiver(post_save, sender=EditChapter)
 @receiver(post_delete, sender=EditChapter)
 def monitor_changed(sender, instance, **kwargs):
-    one_hour_ago = timezone.now() - timedelta(hours=1)
-    data = {
-        "scanning": {
-            "manga": len(MonitorManga.objects.filter(Q(last_run__lt=one_hour_ago) | Q(last_run__isnull=True))),
-            "chapters": len(MonitorChapter.objects.filter(Q(last_run__lt=one_hour_ago) | Q(last_run__isnull=True)))
-        },"editing": {
-            "chapters": len(EditChapter.objects.all())
-        },
-    }
-    notify_clients(data)
-
-def on_download(current:int, of:int):
-    data = {
-        "downloading": {
-            "current": current,
-            "of": of
-        }
-    }
-    notify_clients(data)
\ No newline at end of file
+    queue_broadcaster.mark_dirty()
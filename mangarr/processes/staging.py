@@ -0,0 +1,129 @@
+"""
+Staging folders of chapter downloads, which survive between attempts of the same job.
+
+Every downloaded page is kept in the folder together with a line in the manifest (index, size and hash of the page).
+When the job is retried, pages whose file still matches the manifest are reused and only the missing ones are downloaded.
+The folder is removed when the chapter is assembled or when its job is gone (see prune).
+"""
+from core.settings import STAGING_FILE_PATH_ROOT
+from pathlib import Path
+from typing import Iterable
+import hashlib
+import json
+import os
+import shutil
+
+import logging
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.jsonl"
+HASH_CHUNK_SIZE = 64 * 1024
+
+def hash_file(path:Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ChapterStaging:
+    """
+    Staging folder of one chapter download job.
+
+    Manifest is append-only (one JSON object per line), so a crash in the middle of the download
+    loses at most the page being written. First line records the number of pages, if the source
+    returns different number of pages on the next attempt the staged pages are thrown away.
+    """
+
+    def __init__(self, job_id, page_count:int):
+        self.folder = STAGING_FILE_PATH_ROOT / str(job_id)
+        self.manifest_path = self.folder / MANIFEST_NAME
+        self.page_count = page_count
+        self.pages = {}
+        self._load()
+
+    def _load(self) -> None:
+        entries = []
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as manifest:
+                for line in manifest:
+                    try:
+                        entries.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # Last line of interrupted write
+                        break
+        except FileNotFoundError:
+            pass
+
+        if len(entries) == 0 or entries[0].get("page_count") != self.page_count:
+            if len(entries) > 0:
+                logger.debug(f"Number of pages changed, discarding staged pages in {self.folder}")
+            self.clear()
+            return
+
+        for entry in entries[1:]:
+            index = entry.get("index")
+            path = self.page_path(index)
+            try:
+                if path.stat().st_size == entry.get("size") and hash_file(path) == entry.get("sha256"):
+                    self.pages[index] = path
+            except (OSError, TypeError):
+                continue
+        if len(self.pages) > 0:
+            logger.debug(f"Resuming download with {len(self.pages)} of {self.page_count} pages staged in {self.folder}")
+
+    def _append(self, entry:dict) -> None:
+        with open(self.manifest_path, "a", encoding="utf-8") as manifest:
+            manifest.write(json.dumps(entry) + "\n")
+
+    def clear(self) -> None:
+        """
+        Starts the staging over with no pages.
+        """
+        shutil.rmtree(self.folder, ignore_errors=True)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.pages = {}
+        self._append({"page_count": self.page_count})
+
+    def page_path(self, index:int) -> Path:
+        return self.folder / f"{index}.page"
+
+    def missing(self) -> list[int]:
+        """
+        Indexes of pages which still have to be downloaded.
+        """
+        return [i for i in range(self.page_count) if i not in self.pages]
+
+    def is_complete(self) -> bool:
+        return len(self.pages) == self.page_count
+
+    def add(self, index:int, path:Path) -> None:
+        """
+        Records downloaded page, it is reused by the next attempts.
+        """
+        self._append({
+            "index": index,
+            "size": path.stat().st_size,
+            "sha256": hash_file(path),
+        })
+        self.pages[index] = path
+
+    def ordered_pages(self) -> list[Path]:
+        return [self.pages[i] for i in range(self.page_count)]
+
+    def remove(self) -> None:
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+def prune(active_job_ids:Iterable) -> None:
+    """
+    Removes staging folders of jobs which are no longer queued or running.
+    """
+    active = {str(job_id) for job_id in active_job_ids}
+    for entry in os.scandir(STAGING_FILE_PATH_ROOT):
+        if entry.name in active:
+            continue
+        logger.debug(f"Removing staging folder of finished job {entry.name}")
+        if entry.is_dir(follow_symlinks=False):
+            shutil.rmtree(entry.path, ignore_errors=True)
+        else:
+            os.unlink(entry.path)
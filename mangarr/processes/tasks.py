@@ -1,17 +1,22 @@
 from django.db.utils import OperationalError
-from django.db.models import Q
 import time
+import threading
 from django.utils import timezone
 from datetime import timedelta
 import os
 import shutil
-from core.settings import CACHE_FILE_PATH_ROOT
+from core.settings import CACHE_FILE_PATH_ROOT, STAGING_FILE_PATH_ROOT
 from connectors.utils import notify_connectors
 from database.manga.models import Library
-from datetime import datetime, timedelta
 from core.thread_manager import stop_event
+from core.settings import CHAPTER_WORKERS, SOURCE_CHAPTER_WORKERS, REFRESH_DEFAULT_INTERVAL, JOB_LEASE
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from django.db import close_old_connections
+from django.db.models import Min
 
-from .models import MonitorManga, MonitorChapter, Manga, ChapterDownloaded, ChapterHadNoPages, EditChapter
+from .models import MonitorManga, MonitorChapter, Manga, ChapterDownloaded, ChapterHadNoPages, EditChapter, JobQuerySet, JobBase
+from . import staging
 
 import logging
 logger = logging.getLogger(__name__)
@@ -20,115 +25,224 @@ def clear_cache():
     logger.debug("Clearing cache folder")
     for filename in os.listdir(CACHE_FILE_PATH_ROOT):
         file_path = os.path.join(CACHE_FILE_PATH_ROOT, filename)
-        if os.path.isfile(file_path) or os.path.islink(file_path):
+        if filename == STAGING_FILE_PATH_ROOT.name:
+            # Pages of chapters which will be retried, only folders of finished jobs are removed
+            staging.prune(MonitorChapter.objects.pending().values_list("pk", flat=True))
+        elif os.path.isfile(file_path) or os.path.islink(file_path):
             os.unlink(file_path)
         elif os.path.isdir(file_path):
             shutil.rmtree(file_path)
     logger.debug("Cache folder cleared")
 
-def process_exists() -> bool:
-    one_hour_ago = timezone.now() - timedelta(hours=1)
-    threshold = timezone.now() - timedelta(hours=24)
-    return Manga.objects.filter(last_update__lt=threshold).exists() or MonitorChapter.objects.filter(Q(last_run__lt=one_hour_ago) | Q(last_run__isnull=True)).exists() or MonitorManga.objects.filter(Q(last_run__lt=one_hour_ago) | Q(last_run__isnull=True)).exists() or EditChapter.objects.all().exists()
+@contextmanager
+def keep_leased(job:JobBase):
+    """
+    Renews lease of the claimed job while it runs, so only jobs of a crashed worker expire.
+    """
+    done = threading.Event()
+
+    def renew():
+        try:
+            while not done.wait(JOB_LEASE / 3):
+                if not job.renew_lease():
+                    return
+        except Exception as e:
+            logger.error(f"Error - {e}")
+        finally:
+            close_old_connections()
+
+    thread = threading.Thread(target=renew, daemon=True, name=f"lease-{type(job).__name__}-{job.pk}")
+    thread.start()
+    try:
+        yield
+    finally:
+        done.set()
+        thread.join()
 
 def update_updates(updates:set, library:Library, modified:bool):
     if library not in updates and modified:
         updates.add(library)
 
-next_run = None
+def download_chapter(chapter_monitor:MonitorChapter) -> Library | None:
+    """
+    Runs one chapter monitor in worker thread
+
+    Returns:
+        Library | None: Library that was modified or None if nothing changed
+    """
+    try:
+        if not chapter_monitor.claim():
+            logger.debug(f"Chapter monitor {chapter_monitor.pk} already claimed, skipping...")
+            return None
+        with keep_leased(chapter_monitor):
+            chapter_monitor.update()
+        return chapter_monitor.manga.library
+    except ChapterDownloaded:
+        logger.debug(f"Chapter already downloaded, skipping...")
+        MonitorChapter.objects.filter(pk=chapter_monitor.pk).delete()
+    except ChapterHadNoPages:
+        logger.debug(f"Chapter had no pages, will try again later...")
+        MonitorChapter.objects.filter(pk=chapter_monitor.pk).delete()
+    except MonitorChapter.DoesNotExist as e:
+        logger.warning(f"Chapter monitor missing - {e}")
+    except Exception as e:
+        logger.error(f"Error - {e}")
+    finally:
+        close_old_connections()
+    return None
+
+def download_chapters(updates:set):
+    """
+    Downloads due chapters with pool of workers, limiting how many chapters run at once per plugin.
+    Stops handing out new chapters when monitor is triggered, so user requested jobs can jump the queue.
+    """
+    source_slots = {}
+    running = {}
+    with ThreadPoolExecutor(max_workers=CHAPTER_WORKERS, thread_name_prefix="chapters") as executor:
+        while not stop_event.is_set():
+            if len(running) < CHAPTER_WORKERS and not _wake.is_set():
+                candidates = (
+                    MonitorChapter.objects
+                    .due()
+                    .exclude(pk__in=[chapter_monitor.pk for chapter_monitor in running.values()])
+                    .select_related("manga__library")[:CHAPTER_WORKERS * 4]
+                )
+                for chapter_monitor in candidates:
+                    if len(running) >= CHAPTER_WORKERS:
+                        break
+                    if source_slots.get(chapter_monitor.plugin, 0) >= SOURCE_CHAPTER_WORKERS:
+                        continue
+                    source_slots[chapter_monitor.plugin] = source_slots.get(chapter_monitor.plugin, 0) + 1
+                    running[executor.submit(download_chapter, chapter_monitor)] = chapter_monitor
+
+            if not running:
+                break
+
+            done, _ = wait(running, timeout=1, return_when=FIRST_COMPLETED)
+            for future in done:
+                chapter_monitor = running.pop(future)
+                source_slots[chapter_monitor.plugin] -= 1
+                library = future.result()
+                if library is not None:
+                    update_updates(updates, library, True)
+
+        if stop_event.is_set():
+            logger.debug("Waiting for chapter workers to stop...")
+
+def claim_next(queryset:JobQuerySet):
+    """
+    Claims the first due job from queryset
+
+    Returns:
+        JobBase | None: Claimed job or None if there is nothing to do
+    """
+    for job in queryset.due()[:10]:
+        if job.claim():
+            return job
+    return None
+
+def enqueue_stale_manga(updates:set):
+    now = timezone.now()
+    for manga in Manga.objects.filter(next_check__lte=now).select_related("library"):
+        if stop_event.is_set():
+            return
+        try:
+            monitor_manga, monitor_created = MonitorManga.objects.get_or_create(library=manga.library, plugin=manga.plugin, url=manga.url, arguments=manga.arguments, manga=manga)
+            # Refresh plans the real next check, this only keeps failing refreshes from being enqueued again right away
+            manga.last_update = now
+            manga.next_check = now + timedelta(hours=REFRESH_DEFAULT_INTERVAL)
+            manga.save(update_fields=["last_update", "next_check"])
+            update_updates(updates, monitor_manga.library, monitor_created)
+        except Manga.DoesNotExist as e:
+            logger.warning(f"Manga missing - {e}")
+        except Exception as e:
+            logger.error(f"Error - {e}")
+
+def run_manga_monitors(updates:set):
+    while not stop_event.is_set():
+        manga_monitor = claim_next(MonitorManga.objects.select_related("library", "manga"))
+        if manga_monitor is None:
+            return
+        try:
+            with keep_leased(manga_monitor):
+                manga_monitor.update()
+            update_updates(updates, manga_monitor.library, True)
+        except MonitorManga.DoesNotExist as e:
+            logger.warning(f"Manga monitor missing - {e}")
+        except Exception as e:
+            logger.error(f"Error - {e}")
+
+def run_chapter_edits(updates:set):
+    while not stop_event.is_set() and not _wake.is_set():
+        edit_chapter = claim_next(EditChapter.objects.select_related("chapter__volume__manga__library"))
+        if edit_chapter is None:
+            return
+        try:
+            library = edit_chapter.chapter.volume.manga.library
+            with keep_leased(edit_chapter):
+                edit_chapter.update()
+            update_updates(updates, library, True)
+        except Exception as e:
+            logger.error(f"Error - {e}")
+            edit_chapter.fail(e)
+
+JOB_MODELS = (MonitorManga, MonitorChapter, EditChapter)
+MAX_IDLE_WAIT = timedelta(minutes=10)
+
+def work_exists() -> bool:
+    now = timezone.now()
+    return any(model.objects.due(now).exists() for model in JOB_MODELS)
+
+def time_until_next_job() -> timedelta:
+    """
+    Time until the earliest queued job, expired lease of running job or manga refresh becomes due (at most MAX_IDLE_WAIT)
+    """
+    next_times = [model.objects.next_due_time() for model in JOB_MODELS]
+    next_times.append(Manga.objects.aggregate(next_check=Min("next_check"))["next_check"])
+    due_times = [due_time for due_time in next_times if due_time is not None]
+    if len(due_times) == 0:
+        return MAX_IDLE_WAIT
+    return max(timedelta(0), min(min(due_times) - timezone.now(), MAX_IDLE_WAIT))
+
+def wait_for_work(timeout:timedelta):
+    deadline = time.monotonic() + timeout.total_seconds()
+    while not stop_event.is_set():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or _wake.wait(min(remaining, 5)):
+            return
+
+_wake = threading.Event()
 def monitoring():
-    global next_run
     while not stop_event.is_set():
-        if next_run is None or next_run <= timezone.now():
-            updated = False
-            updates = set()
-            try:
-                while process_exists() and not stop_event.is_set():
-                    logger.debug("Monitoring check...")
-                    clear_cache()
-                    one_hour_ago = timezone.now() - timedelta(hours=1)
-                    threshold = timezone.now() - timedelta(hours=24)
-            
-                    for manga in Manga.objects.filter(last_update__lt=threshold):
-                        if stop_event.is_set():
-                            return
-                        try:
-                            monitor_manga, monitor_created = MonitorManga.objects.get_or_create(library=manga.library, plugin=manga.plugin, url=manga.url, arguments=manga.arguments, manga=manga)
-                            manga.update_last_update()
-                            update_updates(updates, monitor_manga.library, monitor_created)
-                        except Manga.DoesNotExist as e:
-                            logger.warning(f"Manga missing - {e}")
-                        except Exception as e:
-                            logger.error(f"Error - {e}")
-
-                    if stop_event.is_set():
-                        return
-
-                    for manga_monitor in MonitorManga.objects.filter(Q(last_run__lt=one_hour_ago) | Q(last_run__isnull=True)):
-                        if stop_event.is_set():
-                            return
-                        try:
-                            manga_monitor.update()
-                            update_updates(updates, manga_monitor.library, True)
-                        except MonitorManga.DoesNotExist as e:
-                            logger.warning(f"Manga monitor missing - {e}")
-                        except Exception as e:
-                            logger.error(f"Error - {e}")
-                    
-                    if stop_event.is_set():
-                        return
-
-                    skipped_chapters = []
-                    for chapter_monitor in MonitorChapter.objects.filter(Q(last_run__lt=one_hour_ago) | Q(last_run__isnull=True)):
-                        if stop_event.is_set():
-                            return
-                        try:
-                            chapter_monitor.update()
-                            update_updates(updates, chapter_monitor.manga.library, True)
-                        except ChapterDownloaded:
-                            logger.debug(f"Chapter already downloaded, skipping...")
-                            skipped_chapters.append(chapter_monitor.pk)
-                        except ChapterHadNoPages:
-                            logger.debug(f"Chapter had no pages, will try again later...")
-                            skipped_chapters.append(chapter_monitor.pk)
-                        except MonitorChapter.DoesNotExist as e:
-                            logger.warning(f"Chapter monitor missing - {e}")
-                        except Exception as e:
-                            logger.error(f"Error - {e}")
-
-                    MonitorChapter.objects.filter(pk__in=skipped_chapters).delete()
-                    
-                    if stop_event.is_set():
-                        return
-
-                    for editChapter in EditChapter.objects.all():
-                        if stop_event.is_set():
-                            return
-                        try:
-                            library = editChapter.chapter.volume.manga.library
-                            editChapter.update()
-                            update_updates(updates, library, True)
-                        except Exception as e:
-                            logger.error(f"Error - {e}")
-                    
-                    if stop_event.is_set():
-                        return
-
-                if len(updates) != 0:
-                    for lib in updates:
-                        notify_connectors(lib)
-                    
+        updates = set()
+        try:
+            enqueue_stale_manga(updates)
+
+            while work_exists() and not stop_event.is_set():
+                logger.debug("Monitoring check...")
+                _wake.clear()
+                clear_cache()
+
+                run_manga_monitors(updates)
                 if stop_event.is_set():
                     return
 
+                download_chapters(updates)
+                if stop_event.is_set():
+                    return
+
+                run_chapter_edits(updates)
+                if stop_event.is_set():
+                    return
 
+            if len(updates) != 0:
+                for lib in updates:
+                    notify_connectors(lib)
 
-            except OperationalError as e:
-                logger.error(f"Error - {e}")
+        except OperationalError as e:
+            logger.error(f"Error - {e}")
 
-            next_run = timezone.now() + timedelta(hours=1)
-        time.sleep(10)  # 10 seconds
+        wait_for_work(time_until_next_job())
 
 def trigger_monitor():
-    global next_run
-    next_run = None
\ No newline at end of file
+    _wake.set()
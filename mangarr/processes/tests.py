@@ -1,3 +1,243 @@
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+from .broadcast import Broadcaster, DownloadProgress
+from . import staging
+from .cbz import CbzWriter, raw_copy_supported, read_comic_info, replace_comic_info
+from database.manga.models import Library, Manga, Volume, Chapter
+from .models import MonitorManga, MonitorChapter, JobState, PRIORITY_USER, get_retry_delay
+from core.settings import MAX_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY
+import tempfile
+import zipfile
 
 # Create your tests here.
+class CbzTests(SimpleTestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        self.path = Path(self.folder.name)
+
+    def test_raw_copy_supported(self):
+        # Fails when zipfile internals used by CbzWriter.copy_entry change, entries would then be recompressed
+        self.assertTrue(raw_copy_supported())
+
+    def test_replace_comic_info_round_trip(self):
+        pages = {f"{i}.png": bytes([i]) * (1000 + i) for i in range(1, 4)}
+        for i, content in enumerate(pages.values(), start=1):
+            (self.path / f"{i}.page").write_bytes(content)
+
+        source = self.path / "source.cbz"
+        with CbzWriter(source) as cbz:
+            for i, name in enumerate(pages, start=1):
+                cbz.add_page(name, self.path / f"{i}.page")
+            cbz.add_comic_info("<ComicInfo><Title>Old</Title></ComicInfo>")
+
+        target = self.path / "target.cbz"
+        replace_comic_info(source, target, "<ComicInfo><Title>New</Title></ComicInfo>")
+
+        with zipfile.ZipFile(target) as cbz:
+            self.assertIsNone(cbz.testzip())
+            self.assertEqual(cbz.namelist(), [*pages, "ComicInfo.xml"])
+            for name, content in pages.items():
+                self.assertEqual(cbz.read(name), content)
+        self.assertEqual(read_comic_info(target), b"<ComicInfo><Title>New</Title></ComicInfo>")
+
+class JobQueueTests(TestCase):
+    def create_job(self, name:str, **kwargs) -> MonitorChapter:
+        return MonitorChapter.objects.create(url=f"https://example.com/{name}", plugin="example", arguments={"name": name}, **kwargs)
+
+    def test_due_orders_by_priority_then_age(self):
+        now = timezone.now()
+        old = self.create_job("old", not_before=now - timedelta(minutes=5))
+        new = self.create_job("new", not_before=now - timedelta(minutes=1))
+        user = self.create_job("user", not_before=now, priority=PRIORITY_USER)
+        self.create_job("later", not_before=now + timedelta(hours=1))
+
+        self.assertEqual(list(MonitorChapter.objects.due(now)), [user, old, new])
+
+    def test_claim_is_exclusive(self):
+        job = self.create_job("job")
+        other = MonitorChapter.objects.get(pk=job.pk)
+
+        self.assertTrue(job.claim())
+        self.assertFalse(other.claim())
+        job = MonitorChapter.objects.get(pk=job.pk)
+        self.assertEqual((job.state, job.attempts), (JobState.RUNNING, 1))
+
+    def test_expired_lease_is_claimed_again(self):
+        job = self.create_job("job")
+        self.assertTrue(job.claim(lease=timedelta(seconds=-1)))
+
+        other = MonitorChapter.objects.get(pk=job.pk)
+        self.assertTrue(other.claim())
+        self.assertEqual(other.attempts, 2)
+        # Worker which lost the lease can't extend it anymore
+        self.assertFalse(job.renew_lease())
+        self.assertTrue(other.renew_lease())
+
+    def test_next_due_time_includes_running_leases(self):
+        job = self.create_job("job", not_before=timezone.now() + timedelta(hours=1))
+        self.assertEqual(MonitorChapter.objects.next_due_time(), job.not_before)
+
+        MonitorChapter.objects.filter(pk=job.pk).update(not_before=timezone.now())
+        job = MonitorChapter.objects.get(pk=job.pk)
+        job.claim(lease=timedelta(minutes=5))
+        self.assertEqual(MonitorChapter.objects.next_due_time(), job.lease_until)
+
+class JobRetryTests(TestCase):
+    def setUp(self):
+        self.job = MonitorChapter.objects.create(url="https://example.com/job", plugin="example", arguments={"name": "job"})
+
+    def test_retry_delay_grows_exponentially_up_to_max(self):
+        for attempts in range(1, 4):
+            delay = get_retry_delay(attempts).total_seconds()
+            base = RETRY_BASE_DELAY * 2 ** (attempts - 1)
+            self.assertTrue(base / 2 <= delay <= base)
+        self.assertLessEqual(get_retry_delay(100).total_seconds(), RETRY_MAX_DELAY)
+
+    def test_failed_job_waits_for_backoff(self):
+        self.job.claim()
+        self.job.fail("Timeout")
+
+        job = MonitorChapter.objects.get(pk=self.job.pk)
+        self.assertEqual((job.state, job.attempts, job.last_error, job.lease_until), (JobState.QUEUED, 1, "Timeout", None))
+        self.assertGreater(job.not_before, timezone.now())
+        self.assertFalse(MonitorChapter.objects.due().filter(pk=job.pk).exists())
+
+    def test_job_is_dead_after_max_attempts(self):
+        MonitorChapter.objects.filter(pk=self.job.pk).update(attempts=MAX_ATTEMPTS - 1)
+        job = MonitorChapter.objects.get(pk=self.job.pk)
+        job.claim()
+        job.fail("Timeout")
+
+        job = MonitorChapter.objects.get(pk=self.job.pk)
+        self.assertEqual(job.state, JobState.DEAD)
+        self.assertFalse(MonitorChapter.objects.pending().filter(pk=job.pk).exists())
+
+        job.retry()
+        job = MonitorChapter.objects.get(pk=self.job.pk)
+        self.assertEqual((job.state, job.attempts, job.last_error), (JobState.QUEUED, 0, ""))
+        self.assertTrue(MonitorChapter.objects.due().filter(pk=job.pk).exists())
+
+class UpdateChaptersTests(TestCase):
+    def setUp(self):
+        library = Library.objects.create(name="Update")
+        self.manga = Manga.objects.create(library=library, url="https://example.com/manga", plugin="example")
+        self.monitor = MonitorManga(library=library, url=self.manga.url, plugin="example", manga=self.manga)
+        volume = Volume.objects.create(manga=self.manga)
+        self.downloaded = Chapter.objects.create(volume=volume, url="https://example.com/chapter/1", downloaded=True)
+        self.downloaded.name.set_value("Old name")
+        self.downloaded.save()
+
+    def chapter_data(self, number:int, name:str) -> dict:
+        return {"url": f"https://example.com/chapter/{number}", "name": name, "volume_number": 1, "chapter_number": number}
+
+    def test_new_chapters_are_queued_and_downloaded_updated_in_place(self):
+        self.monitor.update_chapters(self.manga, [self.chapter_data(1, "New name"), self.chapter_data(2, "Second")])
+
+        self.assertEqual(Chapter.objects.get(pk=self.downloaded.pk).name.value, "New name")
+        self.assertEqual(list(MonitorChapter.objects.values_list("url", "arguments")), [("https://example.com/chapter/2", self.chapter_data(2, "Second"))])
+
+    def test_queued_chapters_are_upserted(self):
+        self.monitor.update_chapters(self.manga, [self.chapter_data(2, "Second")])
+        job = MonitorChapter.objects.get()
+
+        self.monitor.update_chapters(self.manga, [self.chapter_data(2, "Renamed"), self.chapter_data(3, "Third")])
+
+        self.assertEqual(MonitorChapter.objects.count(), 2)
+        # Existing job keeps its row (and its retry bookkeeping), only arguments change
+        self.assertEqual(MonitorChapter.objects.get(pk=job.pk).arguments, self.chapter_data(2, "Renamed"))
+
+    def test_has_missing_chapters(self):
+        chapters = [self.chapter_data(1, "Old name"), self.chapter_data(2, "Second")]
+        self.assertTrue(MonitorManga.has_missing_chapters(chapters))
+
+        self.monitor.update_chapters(self.manga, chapters)
+        self.assertFalse(MonitorManga.has_missing_chapters(chapters))
+
+class BroadcastTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch("processes.broadcast.publish")
+        self.publish = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_changes_are_coalesced_into_one_broadcast(self):
+        state = {"queue": 0}
+        snapshot = mock.Mock(side_effect=lambda: dict(state))
+        broadcaster = Broadcaster(snapshot)
+        for i in range(100):
+            state["queue"] = i
+            broadcaster.mark_dirty()
+
+        broadcaster.flush()
+
+        snapshot.assert_called_once()
+        self.publish.assert_called_once_with({"queue": 99})
+        self.assertFalse(broadcaster._dirty.is_set())
+
+    def test_unchanged_state_is_not_broadcast(self):
+        broadcaster = Broadcaster(lambda: {"queue": 1})
+        broadcaster.flush()
+        broadcaster.mark_dirty()
+        broadcaster.flush()
+
+        self.publish.assert_called_once()
+
+    def test_download_progress_is_kept_per_job(self):
+        progress = DownloadProgress()
+        progress.report(1, 2, 10, "First")
+        progress.report(2, 5, 20, "Second")
+        progress.finish(1)
+
+        self.assertEqual(progress.snapshot(), {"downloading": {"2": {"current": 5, "of": 20, "name": "Second"}}})
+
+class StagingTests(SimpleTestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        patcher = mock.patch("processes.staging.STAGING_FILE_PATH_ROOT", Path(folder.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def stage_pages(self, chapter_staging:staging.ChapterStaging, indexes) -> None:
+        for index in indexes:
+            path = chapter_staging.page_path(index)
+            path.write_bytes(bytes([index]) * 100)
+            chapter_staging.add(index, path)
+
+    def test_download_resumes_with_staged_pages(self):
+        self.stage_pages(staging.ChapterStaging(1, 4), [0, 2])
+
+        resumed = staging.ChapterStaging(1, 4)
+        self.assertEqual(resumed.missing(), [1, 3])
+        self.stage_pages(resumed, resumed.missing())
+        self.assertTrue(resumed.is_complete())
+        self.assertEqual(resumed.ordered_pages(), [resumed.page_path(i) for i in range(4)])
+
+    def test_damaged_pages_are_downloaded_again(self):
+        first = staging.ChapterStaging(1, 3)
+        self.stage_pages(first, [0, 1, 2])
+        first.page_path(1).write_bytes(b"damaged")
+        # Write interrupted by a crash
+        with open(first.manifest_path, "a", encoding="utf-8") as manifest:
+            manifest.write('{"index": 2, "si')
+
+        self.assertEqual(staging.ChapterStaging(1, 3).missing(), [1])
+
+    def test_changed_page_count_starts_over(self):
+        self.stage_pages(staging.ChapterStaging(1, 3), [0, 1])
+
+        restarted = staging.ChapterStaging(1, 5)
+        self.assertEqual(restarted.missing(), [0, 1, 2, 3, 4])
+        self.assertFalse(restarted.page_path(0).exists())
+
+    def test_prune_keeps_active_jobs_only(self):
+        active = staging.ChapterStaging(1, 1)
+        finished = staging.ChapterStaging(2, 1)
+
+        staging.prune([1])
+
+        self.assertTrue(active.folder.exists())
+        self.assertFalse(finished.folder.exists())
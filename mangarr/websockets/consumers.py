@@ -1,12 +1,16 @@
 from channels.generic.websocket import AsyncWebsocketConsumer
 from asgiref.sync import sync_to_async
 import json
-import copy
-from django.core.cache import cache
+import time
+import redis
+from core.redis_client import get_redis
 
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 
+import logging
+logger = logging.getLogger(__name__)
+
 def notify_clients(new_data):
     channel_layer = get_channel_layer()
     async_to_sync(channel_layer.group_send)(
@@ -17,22 +21,19 @@ def notify_clients(new_data):
         }
     )
 
-
-def deep_merge(dict_a, dict_b):
-    result = copy.deepcopy(dict_a)
-    for key, value in dict_b.items():
-        if (
-            key in result and
-            isinstance(result[key], dict) and
-            isinstance(value, dict)
-        ):
-            result[key] = deep_merge(result[key], value)
-        else:
-            result[key] = copy.deepcopy(value)
-    return result
+# Shared state lives in Redis, so every web worker sends the same state to its clients
+STATE_KEY_PREFIX = "mangarr:processes:"
+# Section name -> JSON of the section (scanning, editing), every publish replaces its sections whole
+STATE_SECTIONS_KEY = f"{STATE_KEY_PREFIX}sections"
+# Job id -> JSON of its progress, every process adds and removes only its own jobs
+STATE_DOWNLOADING_KEY = f"{STATE_KEY_PREFIX}downloading"
+STATE_VERSION_KEY = f"{STATE_KEY_PREFIX}version"
+# Progress of a job not updated for that long is left over from a process that died
+DOWNLOAD_STALE_AFTER = 600
 
 def default_datas() -> dict:
     return {
+            "version": 0,
             "scanning": {
                 "manga": 0,
                 "chapters": 0
@@ -40,12 +41,44 @@ def default_datas() -> dict:
             "editing": {
                 "chapters": 0
             },
-            "downloading": {
-                "current": 0,
-                "of": 0
-            }
+            # Job id -> {"current", "of", "name"}
+            "downloading": {}
         }
 
+def get_state() -> dict:
+    """
+    Returns the shared state, made of all the published sections and download progress of all processes.
+    """
+    state = default_datas()
+    try:
+        pipeline = get_redis().pipeline(transaction=False)
+        pipeline.get(STATE_VERSION_KEY)
+        pipeline.hgetall(STATE_SECTIONS_KEY)
+        pipeline.hgetall(STATE_DOWNLOADING_KEY)
+        version, sections, downloading = pipeline.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Redis unavailable - {e}")
+        return state
+
+    state["version"] = int(version or 0)
+    for section, value in sections.items():
+        state[section.decode()] = json.loads(value)
+
+    stale = []
+    now = time.time()
+    for job_id, value in downloading.items():
+        progress = json.loads(value)
+        if now - progress.pop("updated", 0) > DOWNLOAD_STALE_AFTER:
+            stale.append(job_id)
+            continue
+        state["downloading"][job_id.decode()] = progress
+    if len(stale) > 0:
+        try:
+            get_redis().hdel(STATE_DOWNLOADING_KEY, *stale)
+        except redis.RedisError as e:
+            logger.warning(f"Redis unavailable - {e}")
+    return state
+
 class ProcessesConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.user_id = self.scope["user"].id
@@ -54,7 +87,7 @@ class ProcessesConsumer(AsyncWebsocketConsumer):
         await self.channel_layer.group_add(self.group_name, self.channel_name)        
         await self.accept()
 
-        await self.send(text_data=json.dumps({"message": "Connected!", "data": default_datas()}))
+        await self.send(text_data=json.dumps({"message": "Connected!", "data": await sync_to_async(get_state)()}))
 
     async def disconnect(self, code):
         await self.channel_layer.group_discard(self.group_name, self.channel_name)
@@ -63,7 +96,5 @@ class ProcessesConsumer(AsyncWebsocketConsumer):
         pass
 
     async def send_update(self, event):
-        data = deep_merge(await sync_to_async(cache.get)(f'process_data_{self.user_id}') or default_datas(), event["data"])
-        await sync_to_async(cache.set)(f'process_data_{self.user_id}', data)
-
-        await self.send(text_data=json.dumps(data))
\ No newline at end of file
+        # Event already carries the whole shared state
+        await self.send(text_data=json.dumps(event["data"]))
\ No newline at end of file